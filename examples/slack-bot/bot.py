@@ -11,28 +11,58 @@ This bot implements a simplified architecture where:
 
 import os
 import logging
+import logging.handlers
 import argparse
 import time
-from typing import Dict, List, Any
-from threading import Event
+import random
+from typing import Dict, List, Any, Optional
+from threading import Event, Lock, Timer
+from collections import OrderedDict
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from functools import lru_cache
 from dotenv import load_dotenv
+import orjson
 
 from slack_sdk.socket_mode import SocketModeClient
 from slack_sdk.web import WebClient
+from slack_sdk.errors import SlackApiError, SlackClientError
 from slack_sdk.socket_mode.request import SocketModeRequest
 from slack_sdk.socket_mode.client import BaseSocketModeClient
-from src.agents.langchain_compatibility_adapter import LangChainCompatibilityAdapter
 
-# Configure logging
+class OrjsonFormatter(logging.Formatter):
+    """Format each record as one JSON object per line, for log shippers"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+# Configure logging. The log file is rotated and written in batches: records
+# are buffered in memory until 100 have piled up or a warning comes in.
+file_handler = logging.handlers.RotatingFileHandler('bot.log', maxBytes=10_000_000, backupCount=3)
+stream_handler = logging.StreamHandler()
+if os.environ.get("LOG_FORMAT") == "json":
+    # basicConfig keeps formatters that are already set
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(OrjsonFormatter())
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
+        file_handler,
+        stream_handler
     ]
 )
+# basicConfig formats the handlers it is given, so buffer the file handler afterwards
+logging.root.removeHandler(file_handler)
+logging.root.addHandler(logging.handlers.MemoryHandler(100, flushLevel=logging.WARNING, target=file_handler))
 logger = logging.getLogger(__name__)
 
 # Set specific loggers to INFO level to show debug messages
@@ -40,7 +70,7 @@ logging.getLogger('src.agents.malloy_langchain_agent').setLevel(logging.INFO)
 logging.getLogger('src.agents').setLevel(logging.INFO)
 logging.getLogger('src').setLevel(logging.INFO)
 
-@dataclass
+@dataclass(slots=True)
 class ServiceHealth:
     """Monitor the operational status of critical bot components
     
@@ -53,37 +83,103 @@ class ServiceHealth:
     slack_client: bool = False
     mcp_server: bool = False
     
+@dataclass(slots=True)
+class ConvEntry:
+    """A cached conversation, when it was last used (time.monotonic()) and how often"""
+    history: List[Dict[str, Any]]
+    last_access: float
+    hit_count: int = 0
+
 class CircuitBreaker:
     """Circuit breaker pattern to prevent cascading failures from MCP server issues
     
     Automatically opens (stops requests) when failure threshold is reached,
-    then gradually allows requests after timeout period to test recovery.
+    then a timer moves it to HALF_OPEN after the timeout period to test recovery.
+    While HALF_OPEN only a few probe requests are admitted at a time, and the
+    breaker closes again once enough of them have succeeded.
+    Safe to share between worker threads: state transitions happen under a lock.
     """
-    def __init__(self, failure_threshold: int = 5, timeout: int = 60):
+    __slots__ = (
+        "failure_threshold", "timeout", "success_threshold", "half_open_max_calls",
+        "failure_count", "state", "half_open_in_flight", "half_open_successes",
+        "_timer", "_lock"
+    )
+    
+    def __init__(self, failure_threshold: int = 5, timeout: int = 60,
+                 success_threshold: int = 3, half_open_max_calls: int = 3):
         self.failure_threshold = failure_threshold
         self.timeout = timeout
+        self.success_threshold = success_threshold
+        self.half_open_max_calls = half_open_max_calls
         self.failure_count = 0
-        self.last_failure_time = None
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self._timer: Optional[Timer] = None  # Moves an OPEN breaker to HALF_OPEN
+        self._lock = Lock()
     
     def is_open(self) -> bool:
-        if self.state == "OPEN":
-            if time.time() - self.last_failure_time > self.timeout:
-                self.state = "HALF_OPEN"
-                return False
+        """Return True if the request should be rejected
+        
+        A False result while HALF_OPEN admits the caller as a probe, so it must
+        be followed by record_success() or record_failure().
+        """
+        # Fast path without the lock - only HALF_OPEN needs to count callers
+        state = self.state
+        if state == "CLOSED":
+            return False
+        if state == "OPEN":
             return True
-        return False
+        with self._lock:
+            # Re-check: another thread may have moved the breaker on meanwhile
+            if self.state == "HALF_OPEN":
+                if self.half_open_in_flight >= self.half_open_max_calls:
+                    return True
+                self.half_open_in_flight += 1
+            return self.state == "OPEN"
     
     def record_success(self):
-        self.failure_count = 0
-        self.state = "CLOSED"
+        with self._lock:
+            if self.state == "HALF_OPEN":
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+                self.half_open_successes += 1
+                if self.half_open_successes < self.success_threshold:
+                    return
+                logger.info("Circuit breaker CLOSED - MCP server recovered")
+            self.failure_count = 0
+            self.state = "CLOSED"
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
     
     def record_failure(self):
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        if self.failure_count >= self.failure_threshold:
-            self.state = "OPEN"
-            logger.warning(f"Circuit breaker OPEN - MCP failures: {self.failure_count}")
+        with self._lock:
+            self.failure_count += 1
+            if self.state == "HALF_OPEN":
+                # A failed probe means the server has not recovered yet
+                self._open()
+                logger.warning("Circuit breaker re-OPENED - probe request failed")
+            elif self.failure_count >= self.failure_threshold and self.state != "OPEN":
+                self._open()
+                logger.warning("Circuit breaker OPEN - MCP failures: %s", self.failure_count)
+    
+    def _open(self):
+        """Open the breaker and schedule the move to HALF_OPEN; caller holds the lock"""
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self.state = "OPEN"
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = Timer(self.timeout, self._half_open)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _half_open(self):
+        with self._lock:
+            if self.state == "OPEN":
+                self.state = "HALF_OPEN"
+                self._timer = None
+                logger.info("Circuit breaker HALF_OPEN - probing MCP server")
 
 def parse_args():
     """Parse command line arguments for LLM model and provider configuration
@@ -92,75 +188,217 @@ def parse_args():
         argparse.Namespace: Parsed arguments including model choice and optional provider override
     """
     parser = argparse.ArgumentParser(description='Malloy Slack Bot')
-    parser.add_argument('--model', choices=[
-        'gpt-4o', 'gpt-4o-mini', 
-        'gemini-1.5-pro', 'gemini-2.5-flash',
-        'claude-3-5-sonnet-20241022', 'claude-3-7-sonnet', 
-        'claude-sonnet-4-20250514', 'claude-opus-4-20250514',
-        'claude-3-5-haiku-20241022'
-    ], default='claude-sonnet-4-20250514', help='LLM model to use')
+    parser.add_argument('--model', choices=list(MODEL_PROVIDERS),
+                       default='claude-sonnet-4-20250514', help='LLM model to use')
     parser.add_argument('--provider', choices=['openai', 'vertex', 'anthropic'], 
                        help='LLM provider (auto-detected from model if not specified)')
     return parser.parse_args()
 
+# Supported models (the --model choices) and the LLM provider serving each
+MODEL_PROVIDERS = {
+    'gpt-4o': 'openai',
+    'gpt-4o-mini': 'openai',
+    'gemini-1.5-pro': 'vertex',
+    'gemini-2.5-flash': 'vertex',
+    'claude-3-5-sonnet-20241022': 'anthropic',
+    'claude-3-7-sonnet': 'anthropic',
+    'claude-sonnet-4-20250514': 'anthropic',
+    'claude-opus-4-20250514': 'anthropic',
+    'claude-3-5-haiku-20241022': 'anthropic',
+}
+
 def get_provider_from_model(model_name: str) -> str:
-    """Auto-detect LLM provider based on model name prefix
+    """Auto-detect LLM provider for a supported model
     
     Args:
-        model_name: Name of the LLM model (e.g., 'gpt-4o', 'claude-3-5-sonnet')
+        model_name: Name of the LLM model (e.g., 'gpt-4o', 'claude-3-5-sonnet-20241022')
         
     Returns:
-        str: Provider name ('openai', 'anthropic', or 'vertex')
+        str: Provider name ('openai', 'anthropic', or 'vertex'); 'openai' for unknown models
     """
-    if model_name.startswith('gpt'):
-        return 'openai'
-    elif model_name.startswith('gemini'):
-        return 'vertex'
-    elif model_name.startswith('claude'):
-        return 'anthropic'
-    else:
-        return 'openai'  # Default
+    return MODEL_PROVIDERS.get(model_name, 'openai')
+
+@dataclass(frozen=True, slots=True)
+class BotConfig:
+    """Tokens and service settings read from the environment"""
+    slack_bot_token: str
+    slack_app_token: str
+    openai_api_key: str
+    mcp_url: str = "http://localhost:4040/mcp"
+    anthropic_api_key: Optional[str] = None
+    vertex_project_id: Optional[str] = None
+    vertex_location: str = "us-central1"
+
+@lru_cache(maxsize=1)
+def load_config() -> BotConfig:
+    """Read the bot configuration from the environment once
+    
+    Raises:
+        ValueError: If a required environment variable is missing
+    """
+    try:
+        return BotConfig(
+            slack_bot_token=os.environ["SLACK_BOT_TOKEN"].strip(),
+            slack_app_token=os.environ["SLACK_APP_TOKEN"].strip(),
+            openai_api_key=os.environ["OPENAI_API_KEY"].strip(),
+            mcp_url=os.environ.get("MCP_URL", "http://localhost:4040/mcp"),
+            anthropic_api_key=os.environ.get("ANTHROPIC_API_KEY"),
+            vertex_project_id=os.environ.get("VERTEX_PROJECT_ID"),
+            vertex_location=os.environ.get("VERTEX_LOCATION", "us-central1")
+        )
+    except KeyError as e:
+        raise ValueError(f"Missing required environment variable: {e}")
 
 # Global variables
 malloy_agent = None
-CONVERSATION_CACHE: Dict[str, List[Dict[str, Any]]] = {}
+# Least recently used conversations sit at the front of the cache
+CONVERSATION_CACHE: "OrderedDict[str, ConvEntry]" = OrderedDict()
+CONVERSATION_LOCK = Lock()  # Worker threads read and update the cache concurrently
+# Conversation id -> number of its turns being answered, guarded by CONVERSATION_LOCK
+ACTIVE_TURNS: Dict[str, int] = {}
+last_conversation_sweep = 0.0
+# Recently handled event ids, oldest first, so Slack redeliveries are only processed once
+SEEN_EVENTS: "OrderedDict[str, None]" = OrderedDict()
+SEEN_EVENTS_LOCK = Lock()
 web_client = None
 socket_mode_client = None
+BOT_USER_ID: Optional[str] = None
+BOT_MENTION: Optional[str] = None
 service_health = ServiceHealth()
 circuit_breaker = CircuitBreaker()
 shutdown_event = Event()
 
+# Questions are answered off the Socket Mode listener thread
+EXECUTOR = ThreadPoolExecutor(max_workers=10, thread_name_prefix="slack-worker")
+# Slack Web API posts run here so workers don't wait on Slack round-trips
+POST_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="slack-post")
+
+# Message subtypes that never carry a question for the bot
+IGNORED_MESSAGE_SUBTYPES = frozenset({
+    "bot_message", "channel_join", "channel_leave", "message_changed", "message_deleted"
+})
+
 # Conversation cleanup settings
 MAX_CONVERSATIONS = 100
 CONVERSATION_TTL_HOURS = 24
+CONVERSATION_SWEEP_SECONDS = 60
+MAX_SEEN_EVENTS = 4096
+STREAM_UPDATE_INTERVAL = 1.0  # Slack allows about one chat.update per second per message
+THINKING_DELAY = 0.8  # Fast answers skip the thinking indicator altogether
+# Slack API errors after which the cached bot identity must be looked up again
+SLACK_AUTH_ERRORS = frozenset({"invalid_auth", "token_revoked"})
+
+# User-facing Slack messages
+THINKING_MESSAGE = "🤔 Let me explore the available data and answer your question..."
+AGENT_DOWN_MESSAGE = "🔧 The Malloy agent is currently down. Our team has been notified and we're working to restore service. Please try again in a few minutes."
+CONNECTION_ERROR_MESSAGE = "🌐 I'm having trouble connecting to the data services. Please try again in a moment."
+GENERIC_ERROR_MESSAGE = "❌ Something went wrong. Please try again or contact support if the issue persists."
 
-def cleanup_old_conversations():
-    """Clean up old conversations to prevent memory leaks"""
-    global CONVERSATION_CACHE
+def get_conversation_history(conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Return cached history for a conversation, marking it as recently used"""
+    with CONVERSATION_LOCK:
+        entry = CONVERSATION_CACHE.get(conversation_id)
+        if entry is None:
+            return None
+        entry.last_access = time.monotonic()
+        entry.hit_count += 1
+        CONVERSATION_CACHE.move_to_end(conversation_id)
+    return entry.history
+
+def expire_old_conversations():
+    """Drop conversations that have been idle for longer than CONVERSATION_TTL_HOURS
+    
+    Called for every event but sweeps at most once per CONVERSATION_SWEEP_SECONDS.
+    """
+    global last_conversation_sweep
     
-    if len(CONVERSATION_CACHE) <= MAX_CONVERSATIONS:
+    now = time.monotonic()
+    if now - last_conversation_sweep < CONVERSATION_SWEEP_SECONDS:
         return
+    last_conversation_sweep = now
     
-    current_time = time.time()
-    cutoff_time = current_time - (CONVERSATION_TTL_HOURS * 3600)
+    cutoff = now - CONVERSATION_TTL_HOURS * 3600
+    with CONVERSATION_LOCK:
+        # Entries are ordered by last use, so the expired ones are all at the front
+        while CONVERSATION_CACHE:
+            conversation_id, entry = next(iter(CONVERSATION_CACHE.items()))
+            if entry.last_access >= cutoff:
+                break
+            CONVERSATION_CACHE.popitem(last=False)
+            logger.info("Expired idle conversation: %s", conversation_id)
+            release_conversation(conversation_id)
+
+def release_conversation(conversation_id: str):
+    """Drop the agent's checkpointed messages for a conversation no longer cached
     
-    # Sort by timestamp and remove oldest
-    conversations_by_time = []
-    for conv_id, history in CONVERSATION_CACHE.items():
-        # Use conversation ID as timestamp if it's numeric, otherwise use current time
-        try:
-            timestamp = float(conv_id)
-        except:
-            timestamp = current_time
-        conversations_by_time.append((timestamp, conv_id))
+    Call with CONVERSATION_LOCK held. A conversation with a turn in flight is
+    left alone; finish_turn releases it once the turn is done, unless the turn
+    cached it again. Clearing is only scheduled on the agent's loop, so it
+    runs before any turn started after the lock is released.
+    """
+    if malloy_agent is None or conversation_id in ACTIVE_TURNS:
+        return
+    malloy_agent.clear_conversation(conversation_id)
+
+def begin_turn(conversation_id: str):
+    """Mark a conversation as being answered, so its checkpoint isn't released meanwhile"""
+    with CONVERSATION_LOCK:
+        ACTIVE_TURNS[conversation_id] = ACTIVE_TURNS.get(conversation_id, 0) + 1
+
+def finish_turn(conversation_id: str):
+    """Mark a turn as done and release the conversation if it ended up uncached
     
-    conversations_by_time.sort()
+    That happens when the turn failed before storing any history, or when the
+    conversation was expired or evicted while the turn was running.
+    """
+    with CONVERSATION_LOCK:
+        remaining = ACTIVE_TURNS.pop(conversation_id) - 1
+        if remaining:
+            ACTIVE_TURNS[conversation_id] = remaining
+        elif conversation_id not in CONVERSATION_CACHE:
+            release_conversation(conversation_id)
+
+def is_duplicate_event(event_id: Optional[str]) -> bool:
+    """Return True if this event was already seen, otherwise remember it"""
+    if not event_id:
+        return False
+    with SEEN_EVENTS_LOCK:
+        if event_id in SEEN_EVENTS:
+            return True
+        SEEN_EVENTS[event_id] = None
+        while len(SEEN_EVENTS) > MAX_SEEN_EVENTS:
+            SEEN_EVENTS.popitem(last=False)
+        return False
+
+def cached_conversation_ids() -> List[str]:
+    """Snapshot of the cached conversation ids, least recently used first"""
+    # Iterating while a worker moves or evicts an entry would raise RuntimeError
+    with CONVERSATION_LOCK:
+        return list(CONVERSATION_CACHE)
+
+def store_conversation_history(conversation_id: str, history: List[Dict[str, Any]]):
+    """Store history for a conversation as the most recently used entry
     
-    # Remove oldest conversations if we exceed limits
-    while len(CONVERSATION_CACHE) > MAX_CONVERSATIONS:
-        _, oldest_id = conversations_by_time.pop(0)
-        CONVERSATION_CACHE.pop(oldest_id, None)
-        logger.info(f"Cleaned up old conversation: {oldest_id}")
+    Evicts conversations beyond MAX_CONVERSATIONS to prevent memory leaks.
+    The victim is the least used conversation among the least recently used
+    10%, so an active conversation with a quiet spell stays cached while
+    one-off questions go first.
+    """
+    with CONVERSATION_LOCK:
+        entry = CONVERSATION_CACHE.get(conversation_id)
+        if entry is None:
+            CONVERSATION_CACHE[conversation_id] = ConvEntry(history, time.monotonic())
+        else:
+            entry.history = history
+            entry.last_access = time.monotonic()
+        CONVERSATION_CACHE.move_to_end(conversation_id)
+        while len(CONVERSATION_CACHE) > MAX_CONVERSATIONS:
+            # The cache is in recency order, so the oldest 10% are simply the first entries
+            window = islice(CONVERSATION_CACHE.items(), max(1, len(CONVERSATION_CACHE) // 10))
+            victim_id, _ = min(window, key=lambda item: item[1].hit_count)
+            del CONVERSATION_CACHE[victim_id]
+            logger.info("Cleaned up old conversation: %s", victim_id)
+            release_conversation(victim_id)
 
 def init_bot(model: str = 'gpt-4o', provider: str = None):
     """Initialize all bot components including LLM agent and Slack clients
@@ -176,68 +414,71 @@ def init_bot(model: str = 'gpt-4o', provider: str = None):
         ValueError: If required environment variables are missing
         Exception: If initialization of any component fails
     """
-    global malloy_agent, web_client, socket_mode_client
+    global malloy_agent, web_client, socket_mode_client, BOT_USER_ID, BOT_MENTION
     
     LLM_MODEL = model
     LLM_PROVIDER = provider or get_provider_from_model(LLM_MODEL)
 
-    # Set API keys and tokens (will raise KeyError if missing)
-    try:
-        SLACK_BOT_TOKEN = os.environ["SLACK_BOT_TOKEN"].strip()
-        SLACK_APP_TOKEN = os.environ["SLACK_APP_TOKEN"].strip()
-        OPENAI_API_KEY = os.environ["OPENAI_API_KEY"].strip()
-        MCP_URL = os.environ.get("MCP_URL", "http://localhost:4040/mcp")
-        
-        # Anthropic configuration  
-        ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
-        
-        # Vertex AI configuration
-        VERTEX_PROJECT_ID = os.environ.get("VERTEX_PROJECT_ID")
-        VERTEX_LOCATION = os.environ.get("VERTEX_LOCATION", "us-central1")
-        
-    except KeyError as e:
-        raise ValueError(f"Missing required environment variable: {e}")
+    config = load_config()
 
     # Log model configuration for debugging
-    logger.info(f"🤖 Initializing Malloy Agent with:")
-    logger.info(f"   - LLM Provider: {LLM_PROVIDER} (from {'command line' if provider else 'auto-detect'})")
-    logger.info(f"   - LLM Model: {LLM_MODEL} (from command line)")
-    logger.info(f"   - MCP URL: {MCP_URL}")
+    logger.info("🤖 Initializing Malloy Agent with:")
+    logger.info("   - LLM Provider: %s (from %s)", LLM_PROVIDER, 'command line' if provider else 'auto-detect')
+    logger.info("   - LLM Model: %s (from command line)", LLM_MODEL)
+    logger.info("   - MCP URL: %s", config.mcp_url)
     if LLM_PROVIDER == "vertex":
-        logger.info(f"   - Vertex Project: {VERTEX_PROJECT_ID}")
-        logger.info(f"   - Vertex Location: {VERTEX_LOCATION}")
+        logger.info("   - Vertex Project: %s", config.vertex_project_id)
+        logger.info("   - Vertex Location: %s", config.vertex_location)
     elif LLM_PROVIDER == "anthropic":
-        logger.info(f"   - Anthropic API Key: {'configured' if ANTHROPIC_API_KEY else 'NOT SET'}")
+        logger.info("   - Anthropic API Key: %s", 'configured' if config.anthropic_api_key else 'NOT SET')
 
     # Initialize LangChain Malloy Agent
     try:
+        # Imported here so the LangChain stack is only loaded once we know which provider to set up
+        from src.agents.langchain_compatibility_adapter import LangChainCompatibilityAdapter
         malloy_agent = LangChainCompatibilityAdapter(
-            openai_api_key=OPENAI_API_KEY,
-            mcp_url=MCP_URL,
+            openai_api_key=config.openai_api_key,
+            mcp_url=config.mcp_url,
             llm_provider=LLM_PROVIDER,
             model_name=LLM_MODEL,
-            anthropic_api_key=ANTHROPIC_API_KEY,
-            vertex_project_id=VERTEX_PROJECT_ID,
-            vertex_location=VERTEX_LOCATION
+            anthropic_api_key=config.anthropic_api_key,
+            vertex_project_id=config.vertex_project_id,
+            vertex_location=config.vertex_location
         )
+        # Connect to MCP and build the agent while the Slack clients start up
+        malloy_agent.prewarm()
         service_health.malloy_agent = True
         logger.info("✅ Malloy agent initialized successfully")
     except Exception as e:
-        logger.error(f"❌ Failed to initialize Malloy agent: {e}")
+        logger.error("❌ Failed to initialize Malloy agent: %s", e)
         service_health.malloy_agent = False
         raise
 
     # Initialize Slack clients with error handling
     try:
-        web_client = WebClient(token=SLACK_BOT_TOKEN)
+        web_client = WebClient(token=config.slack_bot_token)
         socket_mode_client = SocketModeClient(
-            app_token=SLACK_APP_TOKEN,
-            web_client=web_client
+            app_token=config.slack_app_token,
+            web_client=web_client,
+            # The SDK monitors the connection and reconnects by itself; a longer
+            # ping interval avoids false disconnects on jittery networks
+            auto_reconnect_enabled=True,
+            ping_interval=20,
+            on_close_listeners=[log_socket_close]
         )
+        # Resolve the bot's identity once here instead of calling auth_test() per event.
+        # This is the only up-front Slack call, so ride out transient failures.
+        BOT_USER_ID = None
+        
+        def require_bot_identity():
+            if resolve_bot_identity() is None:
+                raise RuntimeError("Could not resolve the bot's Slack user id")
+        
+        retry_with_backoff(require_bot_identity, "Resolving bot identity", max_retries=3)
         service_health.slack_client = True
         logger.info("✅ Slack clients initialized successfully")
     except Exception as e:
-        logger.error(f"❌ Failed to initialize Slack clients: {e}")
+        logger.error("❌ Failed to initialize Slack clients: %s", e)
         service_health.slack_client = False
         raise
     
@@ -245,7 +486,145 @@ def init_bot(model: str = 'gpt-4o', provider: str = None):
 
 
 
-def send_error_message(channel_id: str, thread_ts: str, error_type: str, error_details: str = ""):
+def resolve_bot_identity() -> Optional[str]:
+    """Return the bot's Slack user id, looking it up with auth_test() if not cached
+    
+    Also sets BOT_MENTION. The lookup is repeated lazily after a failed
+    attempt or once the cached identity has been dropped because Slack
+    reported an auth error (e.g. after token rotation).
+    
+    Returns:
+        str: The bot user id, or None if Slack could not be reached
+    """
+    global BOT_USER_ID, BOT_MENTION
+    
+    if BOT_USER_ID is None:
+        try:
+            user_id = web_client.auth_test()["user_id"]
+        except SlackApiError as e:
+            logger.error("❌ Failed to resolve bot identity: %s", e.response.get("error"))
+            return None
+        except (SlackClientError, OSError) as e:
+            # Network failures (URLError, timeouts) are retried on the next event too
+            logger.warning("⚠️ Could not reach Slack to resolve bot identity: %s", e)
+            return None
+        BOT_MENTION = f"<@{user_id}>"
+        BOT_USER_ID = user_id
+        logger.info("🤖 Bot user id: %s", BOT_USER_ID)
+    return BOT_USER_ID
+
+def log_post_failure(future: Future):
+    """Log a failed Slack post and drop the bot identity on auth errors"""
+    global BOT_USER_ID
+    
+    error = future.exception()
+    if error is None:
+        return
+    if isinstance(error, SlackApiError) and error.response.get("error") in SLACK_AUTH_ERRORS:
+        # Token was rotated or revoked; look the identity up again on the next event
+        BOT_USER_ID = None
+    logger.error("Failed to post Slack message: %s", error)
+
+def post_message(**kwargs) -> Future:
+    """Post a Slack message on the post pool without waiting for it
+    
+    Args:
+        **kwargs: Arguments for web_client.chat_postMessage
+        
+    Returns:
+        Future: Completes once Slack has accepted (or rejected) the message
+    """
+    future = POST_EXECUTOR.submit(web_client.chat_postMessage, **kwargs)
+    future.add_done_callback(log_post_failure)
+    return future
+
+def post_message_later(delay: float, **kwargs) -> Future:
+    """Post a Slack message after a delay unless it is cancelled first
+    
+    Args:
+        delay: Seconds to wait before posting
+        **kwargs: Arguments for web_client.chat_postMessage
+        
+    Returns:
+        Future: Cancel it to skip the post; once the delay has passed it
+            completes like the post_message() future
+    """
+    pending: Future = Future()
+    
+    def relay(posted: Future):
+        error = posted.exception()
+        if error is None:
+            pending.set_result(posted.result())
+        else:
+            pending.set_exception(error)
+    
+    def fire():
+        # Loses the race against cancel() if the caller was already done
+        if pending.set_running_or_notify_cancel():
+            post_message(**kwargs).add_done_callback(relay)
+    
+    timer = Timer(delay, fire)
+    timer.daemon = True
+    timer.start()
+    return pending
+
+class StreamingReply:
+    """Show a streaming agent answer in place of the thinking indicator
+    
+    Called from the agent's thread with the text generated so far. Updates are
+    throttled to Slack's chat.update rate limit and at most one is in flight at
+    a time, so a slow Slack API never holds up the agent.
+    """
+    def __init__(self, channel_id: str, placeholder: Future):
+        self.channel_id = channel_id
+        self.placeholder = placeholder
+        self.streamed = False
+        self._lock = Lock()
+        self._last_update = 0.0
+        self._in_flight: Optional[Future] = None
+        self._closed = False
+    
+    def __call__(self, text: str):
+        # Nothing to update until Slack has accepted the placeholder
+        if not self.placeholder.done() or self.placeholder.cancelled() or self.placeholder.exception() is not None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._closed or now - self._last_update < STREAM_UPDATE_INTERVAL:
+                return
+            if self._in_flight is not None and not self._in_flight.done():
+                return
+            self._last_update = now
+            self.streamed = True
+            self._in_flight = POST_EXECUTOR.submit(
+                web_client.chat_update,
+                channel=self.channel_id,
+                ts=self.placeholder.result()["ts"],
+                text=text
+            )
+            self._in_flight.add_done_callback(log_post_failure)
+    
+    def finish(self, final_post: Optional[Future] = None):
+        """Stop streaming and remove the partial answer
+        
+        Args:
+            final_post: The post that replaces the partial answer; it is
+                allowed to land first so the thread never looks empty
+        """
+        with self._lock:
+            self._closed = True
+            in_flight = self._in_flight
+        if not self.streamed:
+            return
+        wait([f for f in (final_post, in_flight) if f is not None], timeout=10)
+        delete = POST_EXECUTOR.submit(
+            web_client.chat_delete,
+            channel=self.channel_id,
+            ts=self.placeholder.result()["ts"]
+        )
+        delete.add_done_callback(log_post_failure)
+
+def send_error_message(channel_id: str, thread_ts: str, error_type: str, error_details: str = "") -> Future:
     """Send user-friendly error messages based on failure type
     
     Provides contextual error messages for different failure scenarios:
@@ -258,24 +637,180 @@ def send_error_message(channel_id: str, thread_ts: str, error_type: str, error_d
         thread_ts: Thread timestamp for threaded response
         error_type: Category of error for appropriate messaging
         error_details: Optional specific error information
+        
+    Returns:
+        Future: The pending post, see post_message()
+    """
+    if error_type == "agent_down":
+        message = AGENT_DOWN_MESSAGE
+    elif error_type == "connection_error":
+        message = CONNECTION_ERROR_MESSAGE
+    elif error_type == "processing_error" and error_details:
+        message = f"⚠️ I encountered an error processing your request: {error_details}"
+    else:
+        message = GENERIC_ERROR_MESSAGE
+    
+    return post_message(channel=channel_id, thread_ts=thread_ts, text=message)
+
+def handle_user_question(channel_id: str, user_id: str, user_question: str, conversation_id: str, history: Optional[List[Dict[str, Any]]]):
+    """Answer a user question in its Slack thread
+    
+    Runs on the worker pool so that the Socket Mode listener is never blocked
+    on Slack Web API calls or on the (multi-second) agent round-trip.
+    
+    Args:
+        channel_id: Slack channel to respond in
+        user_id: Slack user who asked the question
+        user_question: Question text with the bot mention removed
+        conversation_id: Thread timestamp used as the conversation/session id
+        history: Cached conversation history, if any
     """
+    # Check circuit breaker before processing
+    if circuit_breaker.is_open():
+        logger.warning("Circuit breaker is OPEN - sending agent down message")
+        send_error_message(channel_id, conversation_id, "agent_down")
+        return
+
+    # Send thinking indicator in thread only if the agent is slow to answer;
+    # the answer is streamed into it as the agent generates it
+    thinking = post_message_later(THINKING_DELAY, channel=channel_id, thread_ts=conversation_id, text=THINKING_MESSAGE)
+    reply = StreamingReply(channel_id, thinking)
+    final_post: Optional[Future] = None
+    begin_turn(conversation_id)
+
+    # Process the question with enhanced error handling
     try:
-        if error_type == "agent_down":
-            message = "🔧 The Malloy agent is currently down. Our team has been notified and we're working to restore service. Please try again in a few minutes."
-        elif error_type == "connection_error":
-            message = "🌐 I'm having trouble connecting to the data services. Please try again in a moment."
-        elif error_type == "processing_error":
-            message = f"⚠️ I encountered an error processing your request: {error_details}"
-        else:
-            message = "❌ Something went wrong. Please try again or contact support if the issue persists."
-        
-        web_client.chat_postMessage(
-            channel=channel_id,
-            thread_ts=thread_ts,
-            text=message
+        logger.info("🔄 Processing question for user %s: '%s' (session: %s)", user_id, user_question, conversation_id)
+        success, response_text, final_history = malloy_agent.process_user_question(
+            user_question, history=history, session_id=conversation_id, on_partial=reply
         )
+        # Keep the thread in order: the answer must land after the thinking indicator
+        thinking.cancel()
+        wait([thinking], timeout=10)
+
+        if success:
+            circuit_breaker.record_success()
+            service_health.mcp_server = True
+            logger.info("Successfully processed question for user %s", user_id)
+
+            logger.info("Response from agent: '%s'", response_text)
+            logger.info("Response length: %d", len(response_text))
+            logger.info("Response type: %s", type(response_text))
+
+            # Send the agent's response directly - no JSON parsing needed
+            # The agent is now responsible for including chart URLs in its text response
+            if not response_text or response_text.strip() == "":
+                response_text = "I'm sorry, I couldn't generate a proper response."
+
+            logger.info("📤 Sending agent response to Slack")
+            final_post = post_message(
+                channel=channel_id,
+                thread_ts=conversation_id,
+                text=response_text,
+                unfurl_links=True,  # Allow Slack to unfurl chart URLs
+                unfurl_media=True
+            )
+
+            # Update conversation cache with final history
+            if final_history:
+                store_conversation_history(conversation_id, final_history)
+                logger.info("💾 Updated conversation cache for %s", conversation_id)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("💾 Cache now has keys: %s", cached_conversation_ids())
+            else:
+                logger.info("💾 No final_history to store for %s", conversation_id)
+
+        else:
+            # Failed to process - could be MCP server issue
+            circuit_breaker.record_failure()
+            service_health.mcp_server = False
+            logger.warning("Failed to process question for user %s: %s", user_id, response_text)
+
+            # Check if this looks like an MCP connection error
+            if "connection" in response_text.lower() or "timeout" in response_text.lower():
+                final_post = send_error_message(channel_id, conversation_id, "connection_error")
+            else:
+                final_post = send_error_message(channel_id, conversation_id, "processing_error", response_text)
+
+            # Still update cache even for failed responses to maintain context
+            if final_history:
+                store_conversation_history(conversation_id, final_history)
+                logger.info("💾 Updated conversation cache for FAILED response %s", conversation_id)
+            else:
+                logger.info("💾 No final_history to store for FAILED response %s", conversation_id)
+
     except Exception as e:
-        logger.error(f"Failed to send error message: {e}")
+        thinking.cancel()
+        wait([thinking], timeout=10)
+        circuit_breaker.record_failure()
+        service_health.mcp_server = False
+        logger.exception("Exception processing question for user %s ('%s'): %s", user_id, user_question, e)
+        final_post = send_error_message(channel_id, conversation_id, "processing_error", str(e))
+    finally:
+        reply.finish(final_post)
+        finish_turn(conversation_id)
+
+@dataclass(slots=True)
+class RouteDecision:
+    """How to answer an event the bot should respond to"""
+    user_question: str
+    conversation_id: str
+    history: Optional[List[Dict[str, Any]]]
+
+def extract_question(text: str) -> str:
+    """Remove the bot's mention from a message, if present
+    
+    e.g. "<@U123456> question" -> "question"; text around the mention is kept.
+    """
+    i = text.find(BOT_MENTION)
+    if i < 0:
+        return text
+    return (text[:i] + text[i + len(BOT_MENTION):]).strip()
+
+def route_channel_mention(text: str, thread_ts: Optional[str], message_ts: str) -> Optional[RouteDecision]:
+    """@mention in a channel: answer in the mention's thread"""
+    user_question = extract_question(text)
+    if thread_ts:
+        history = get_conversation_history(thread_ts)
+        logger.debug("Continuing channel thread %s with history: %s", thread_ts, bool(history))
+        return RouteDecision(user_question, thread_ts, history)
+    return RouteDecision(user_question, message_ts, None)
+
+def route_direct_message(text: str, thread_ts: Optional[str], message_ts: str) -> Optional[RouteDecision]:
+    """Top-level direct message: always answer, threading on the message"""
+    history = get_conversation_history(message_ts)
+    logger.debug("💬 Starting/continuing DM thread %s with history: %s", message_ts, bool(history))
+    return RouteDecision(extract_question(text), message_ts, history)
+
+def route_channel_message(text: str, thread_ts: Optional[str], message_ts: str) -> Optional[RouteDecision]:
+    """Top-level channel message: only answer when the bot is mentioned"""
+    if BOT_MENTION not in text:
+        return None
+    return RouteDecision(extract_question(text), message_ts, None)
+
+def route_thread_message(text: str, thread_ts: Optional[str], message_ts: str) -> Optional[RouteDecision]:
+    """Threaded message: answer if the bot is mentioned or started this thread"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🧵 Threaded message received: text='%s', thread_ts='%s'", text, thread_ts)
+        logger.debug("🧵 Current conversation cache keys: %s", cached_conversation_ids())
+    
+    # Conversations are keyed by the exact thread_ts Slack delivers
+    if BOT_MENTION not in text and thread_ts not in CONVERSATION_CACHE:
+        return None
+    history = get_conversation_history(thread_ts)
+    logger.debug("🧵 Continuing thread %s with history: %s", thread_ts, bool(history))
+    return RouteDecision(extract_question(text), thread_ts, history)
+
+# (event type, is direct message, is threaded) -> route. Missing keys are ignored,
+# e.g. app mentions in DMs, which also arrive as message events.
+MESSAGE_ROUTES = {
+    ("app_mention", False, False): route_channel_mention,
+    ("app_mention", False, True): route_channel_mention,
+    ("message", True, False): route_direct_message,
+    ("message", True, True): route_thread_message,
+    ("message", False, False): route_channel_message,
+    ("message", False, True): route_thread_message,
+}
 
 def process_slack_events(client: BaseSocketModeClient, req: SocketModeRequest):
     """Handle Slack events with intelligent conversation context management
@@ -292,287 +827,112 @@ def process_slack_events(client: BaseSocketModeClient, req: SocketModeRequest):
     """
     global malloy_agent
     
-    logger.info(f"🔍 SLACK EVENT: {req.type}")
-    
     if req.type == "events_api":
         client.send_socket_mode_response({"envelope_id": req.envelope_id})
 
         event = req.payload.get("event", {})
-        logger.info(f"🔍 EVENT DETAILS: type={event.get('type')}, user={event.get('user')}, ts={event.get('ts')}, thread_ts={event.get('thread_ts')}")
         
-        # Handle both app_mention and message events
+        # Cheapest checks first: drop bot-authored messages, edits/deletes, joins
+        # and anything that isn't a mention or message before doing other work
+        if event.get("bot_id") or event.get("subtype") in IGNORED_MESSAGE_SUBTYPES:
+            return
         event_type = event.get("type")
+        if event_type not in ("app_mention", "message"):
+            return
+        
+        # Slack redelivers events whose ack it missed - only handle each one once
+        event_id = req.payload.get("event_id") or event.get("client_msg_id") or event.get("ts")
+        if is_duplicate_event(event_id):
+            logger.info("🔁 Ignoring redelivered event %s", event_id)
+            return
+        
+        # Unpack the fields we use once
         user_id = event.get("user")
+        channel_id = event.get("channel") or ""
+        thread_ts = event.get("thread_ts")
+        message_ts = event.get("ts")
         
         # Validate user_id exists
         if not user_id:
-            logger.warning(f"🚨 Event missing user_id: {event}")
+            logger.warning("🚨 Event missing user_id: %s", event)
             return
             
+        bot_user_id = resolve_bot_identity()
+        if bot_user_id is None:
+            logger.warning("🚨 Bot identity unknown - skipping event")
+            return
+        
         # Skip bot's own messages early to prevent self-responses
-        try:
-            bot_user_id = web_client.auth_test()["user_id"]
-            if user_id == bot_user_id:
-                logger.info(f"🤖 Ignoring bot's own message from {user_id}")
-                return
-        except Exception as e:
-            logger.warning(f"Failed to check bot user ID: {e}")
+        if user_id == bot_user_id:
+            logger.info("🤖 Ignoring bot's own message from %s", user_id)
             return
         
-        # Check if this is an event we should respond to
-        should_respond = False
+        expire_old_conversations()
         
-        if event_type == "app_mention":
-            # Only respond to app mentions in channels, not DMs (DMs are handled separately)
-            channel_id = event.get("channel", "")
-            if not channel_id.startswith('D'):
-                should_respond = True
-                logger.info(f"📢 App mention in channel {channel_id}")
-            else:
-                logger.info(f"📢 Ignoring app mention in DM {channel_id} (handled by message event)")
-        elif event_type == "message" and not event.get("thread_ts"):
-            # Handle direct messages (channel starts with 'D') and direct mentions in channels
-            channel_id = event.get("channel", "")
-            text = event.get("text", "").strip()
-            
-            # Direct message channel (starts with 'D') - always respond, no mention needed
-            if channel_id.startswith('D'):
-                should_respond = True
-                logger.info(f"💬 Direct message received in channel {channel_id}")
-            # For regular channels, only respond if bot is mentioned in a non-threaded message
-            else:
-                try:
-                    bot_user_id = web_client.auth_test()["user_id"]
-                    if f"<@{bot_user_id}>" in text:
-                        should_respond = True
-                        logger.info(f"💬 Bot mentioned in channel message")
-                except Exception as e:
-                    logger.warning(f"Failed to get bot user ID for mention check: {e}")
-        elif event_type == "message" and event.get("thread_ts"):
-            # Only respond to threaded messages if:
-            # 1. Bot was mentioned in this message, OR  
-            # 2. Bot started this thread (has existing conversation in this thread)
-            text = event.get("text", "").strip()
-            thread_ts = event.get("thread_ts")
-            bot_user_id = None
-            
-            logger.info(f"🧵 Threaded message received: text='{text}', thread_ts='{thread_ts}'")
-            logger.info(f"🧵 Current conversation cache keys: {list(CONVERSATION_CACHE.keys())}")
-            
-            try:
-                bot_user_id = web_client.auth_test()["user_id"]
-            except Exception as e:
-                logger.warning(f"Failed to get bot user ID: {e}")
-                return
-            
-            # Check if bot was mentioned in this threaded message
-            if f"<@{bot_user_id}>" in text:
-                should_respond = True
-                logger.info(f"🧵 Bot mentioned in threaded message - will respond")
-            # Check if bot started this thread (has existing conversation)
-            elif thread_ts in CONVERSATION_CACHE:
-                should_respond = True
-                logger.info(f"🧵 Continuing bot-started conversation in thread {thread_ts}")
-            else:
-                # Try to find conversation with similar timestamp (fallback for timing mismatches)
-                found_conversation = False
-                for cached_id in CONVERSATION_CACHE.keys():
-                    # Check if the timestamps are very close (within 1 second)
-                    try:
-                        thread_time = float(thread_ts)
-                        cached_time = float(cached_id)
-                        if abs(thread_time - cached_time) < 1.0:
-                            should_respond = True
-                            logger.info(f"🧵 Found close conversation match: thread_ts={thread_ts}, cached_id={cached_id}")
-                            found_conversation = True
-                            break
-                    except (ValueError, TypeError):
-                        continue
-                
-                if not found_conversation:
-                    should_respond = False
-                    logger.info(f"🧵 Ignoring threaded message - bot not mentioned and didn't start this thread")
-                    logger.info(f"🧵 Looking for thread_ts '{thread_ts}' but cache has: {list(CONVERSATION_CACHE.keys())}")
+        # Strip once here; every branch below works on the same text
+        text = (event.get("text") or "").strip()
         
-        if should_respond:
-            text = event.get("text", "").strip()
-            channel_id = event.get("channel")
-            
-            # Validate essential fields
-            if not channel_id:
-                logger.error(f"🚨 Event missing channel_id: {event}")
-                return
-            if not text:
-                logger.warning(f"🚨 Event has empty text - skipping")
-                return
-            
-            # Extract timestamps for conversation management
-            thread_ts = event.get("thread_ts")
-            message_ts = event.get("ts")
-            
-            if not message_ts:
-                logger.error(f"🚨 Event missing message timestamp: {event}")
-                return
-            
-            logger.info(f"Received {event_type} from user {user_id} in channel {channel_id}")
-            
-            # Process text based on event type
-            if event_type == "app_mention":
-                # Remove the bot's mention from the text (e.g., "<@U123456> question" -> "question")
-                user_question = text.split(">", 1)[-1].strip()
-            else:
-                # For thread messages, use the text as-is (but remove mention if present)
-                if f"<@{bot_user_id}>" in text:
-                    user_question = text.replace(f"<@{bot_user_id}>", "").strip()
-                else:
-                    user_question = text
-            
-            # Determine conversation ID and retrieve history
-            # For direct messages, always use threading to maintain conversation history
-            if channel_id.startswith('D'):
-                # Direct message - always use threading for conversation continuity
-                if thread_ts:
-                    # Continue existing DM thread
-                    conversation_id = thread_ts
-                    history = CONVERSATION_CACHE.get(conversation_id)
-                    logger.info(f"💬 Continuing DM thread {conversation_id} with history: {bool(history)}")
-                else:
-                    # Start new DM thread using message timestamp
-                    conversation_id = message_ts
-                    history = CONVERSATION_CACHE.get(conversation_id)  # Check if we have history for this conversation
-                    logger.info(f"💬 Starting/continuing DM thread {conversation_id} with history: {bool(history)}")
-            elif thread_ts:
-                # Follow-up question in existing channel thread
-                conversation_id = thread_ts
-                history = CONVERSATION_CACHE.get(conversation_id)
-                logger.info(f"Continuing channel thread {conversation_id} with history: {bool(history)}")
-            else:
-                # New question in channel - start new thread
-                conversation_id = message_ts
-                history = None
-                logger.info(f"Starting new channel thread {conversation_id}")
-            
-            logger.info(f"💾 Using conversation_id: '{conversation_id}', thread_ts: '{thread_ts}', message_ts: '{message_ts}'")
-            
-            # Check circuit breaker before processing
-            if circuit_breaker.is_open():
-                logger.warning("Circuit breaker is OPEN - sending agent down message")
-                send_error_message(channel_id, conversation_id, "agent_down")
-                return
-            
-            # Send thinking indicator in thread
-            try:
-                web_client.chat_postMessage(
-                    channel=channel_id,
-                    thread_ts=conversation_id,
-                    text="🤔 Let me explore the available data and answer your question..."
-                )
-            except Exception as e:
-                logger.warning(f"Failed to send thinking indicator: {e}")
-
-            # Process the question with enhanced error handling
-            try:
-                logger.info(f"🔄 Processing question for user {user_id}: '{user_question}' (session: {conversation_id})")
-                success, response_text, final_history = malloy_agent.process_user_question(user_question, history=history, session_id=conversation_id)
-                
-                if success:
-                    circuit_breaker.record_success()
-                    service_health.mcp_server = True
-                    logger.info(f"Successfully processed question for user {user_id}")
-                    
-                    logger.info(f"Response from agent: '{response_text}'")
-                    logger.info(f"Response length: {len(response_text)}")
-                    logger.info(f"Response type: {type(response_text)}")
-
-                    # Send the agent's response directly - no JSON parsing needed
-                    # The agent is now responsible for including chart URLs in its text response
-                    if not response_text or response_text.strip() == "":
-                        response_text = "I'm sorry, I couldn't generate a proper response."
-                    
-                    logger.info(f"📤 Sending agent response to Slack")
-                    web_client.chat_postMessage(
-                        channel=channel_id,
-                        thread_ts=conversation_id,
-                        text=response_text,
-                        unfurl_links=True,  # Allow Slack to unfurl chart URLs
-                        unfurl_media=True
-                    )
-                    
-                    # Update conversation cache with final history
-                    if final_history:
-                        CONVERSATION_CACHE[conversation_id] = final_history
-                        logger.info(f"💾 Updated conversation cache for {conversation_id}")
-                        logger.info(f"💾 Cache now has keys: {list(CONVERSATION_CACHE.keys())}")
-                        
-                        # Clean up old conversations periodically
-                        cleanup_old_conversations()
-                    else:
-                        logger.info(f"💾 No final_history to store for {conversation_id}")
-                    
-                else:
-                    # Failed to process - could be MCP server issue
-                    circuit_breaker.record_failure()
-                    service_health.mcp_server = False
-                    logger.warning(f"Failed to process question for user {user_id}: {response_text}")
-                    
-                    # Check if this looks like an MCP connection error
-                    if "connection" in response_text.lower() or "timeout" in response_text.lower():
-                        send_error_message(channel_id, conversation_id, "connection_error")
-                    else:
-                        send_error_message(channel_id, conversation_id, "processing_error", response_text)
-                    
-                    # Still update cache even for failed responses to maintain context
-                    if final_history:
-                        CONVERSATION_CACHE[conversation_id] = final_history
-                        logger.info(f"💾 Updated conversation cache for FAILED response {conversation_id}")
-                    else:
-                        logger.info(f"💾 No final_history to store for FAILED response {conversation_id}")
-                        
-            except Exception as e:
-                circuit_breaker.record_failure()
-                service_health.mcp_server = False
-                logger.error(f"Exception processing question for user {user_id} ('{user_question}'): {e}")
-                logger.error(f"Full traceback:", exc_info=True)
-                send_error_message(channel_id, conversation_id, "processing_error", str(e))
+        route = MESSAGE_ROUTES.get((event_type, channel_id.startswith('D'), bool(thread_ts)))
+        decision = route(text, thread_ts, message_ts) if route else None
+        if decision is None:
+            logger.debug("Ignoring %s in channel %s - not addressed to the bot", event_type, channel_id)
+            return
+        
+        # Validate essential fields
+        if not channel_id:
+            logger.error("🚨 Event missing channel_id: %s", event)
+            return
+        if not text:
+            logger.warning("🚨 Event has empty text - skipping")
+            return
+        if not message_ts:
+            logger.error("🚨 Event missing message timestamp: %s", event)
+            return
+        
+        # One record per handled event; the route helpers only log at DEBUG
+        logger.info(
+            "📨 %s from user %s in channel %s: ts=%s, thread_ts=%s, conversation_id=%s, history=%s",
+            event_type, user_id, channel_id, message_ts, thread_ts, decision.conversation_id, bool(decision.history)
+        )
+        
+        # Hand off the slow part so the listener can pick up the next event
+        EXECUTOR.submit(handle_user_question, channel_id, user_id, decision.user_question, decision.conversation_id, decision.history)
 
-def reconnect_socket_client():
-    """Attempt to restore Slack Socket Mode connection with exponential backoff
+def retry_with_backoff(operation, description: str, max_retries: int = 6, max_delay: float = 60):
+    """Call operation(), retrying failures with jittered exponential backoff
     
-    Implements retry logic with increasing delays between attempts to handle
-    temporary network issues or Slack service disruptions.
+    Jitter keeps many instances from retrying in lockstep after a Slack outage.
     
+    Args:
+        operation: Zero-argument callable to run
+        description: What is being attempted, for logging
+        max_retries: Total number of attempts
+        max_delay: Upper bound in seconds for the backoff before jitter
+        
     Returns:
-        bool: True if reconnection successful, False if all attempts failed
+        Whatever operation() returns
+        
+    Raises:
+        Exception: The last error once all attempts have failed
     """
-    global socket_mode_client
-    
-    max_retries = 3
     for attempt in range(max_retries):
         try:
-            logger.info(f"Attempting to reconnect Socket Mode client (attempt {attempt + 1}/{max_retries})")
-            
-            if socket_mode_client:
-                try:
-                    socket_mode_client.disconnect()
-                except:
-                    pass
-            
-            # Reinitialize and reconnect
-            socket_mode_client.connect()
-            logger.info("✅ Socket Mode client reconnected successfully")
-            return True
-            
+            return operation()
         except Exception as e:
-            logger.error(f"Reconnection attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(10 * (attempt + 1))  # Exponential backoff
-    
-    logger.error("❌ Failed to reconnect Socket Mode client after all attempts")
-    return False
+            if attempt == max_retries - 1:
+                raise
+            delay = min(max_delay, 2 ** attempt) + random.uniform(0, 1)
+            logger.warning("%s failed (attempt %s/%s): %s - retrying in %.1fs", description, attempt + 1, max_retries, e, delay)
+            time.sleep(delay)
+
+def log_socket_close(code: int, reason: Optional[str] = None):
+    """Log Socket Mode disconnects; the SDK reconnects on its own"""
+    logger.warning("Socket Mode connection closed (code=%s, reason=%s) - SDK will reconnect", code, reason)
 
 # --- Main Execution ---
 
-if __name__ == "__main__":
+def main():
+    """Start the bot and block until shutdown"""
     # Load environment variables from .env file
     load_dotenv()
     
@@ -585,39 +945,38 @@ if __name__ == "__main__":
         # Initialize bot with command line arguments
         init_bot(model=args.model, provider=args.provider)
         
-        # Connect Socket Mode client with retry logic
+        # Connect Socket Mode client
         try:
             socket_mode_client.socket_mode_request_listeners.append(process_slack_events)
-            socket_mode_client.connect()
+            retry_with_backoff(socket_mode_client.connect, "Socket Mode connect")
             logger.info("✅ Bot connected and listening for events")
             
-            # Keep the main thread alive with reconnection logic
-            while True:
-                try:
-                    if shutdown_event.wait(30):  # Check every 30 seconds
-                        break
-                        
-                    # Check if socket client is still connected
-                    if socket_mode_client and not socket_mode_client.is_connected():
-                        logger.warning("Socket Mode client disconnected - attempting reconnection")
-                        if not reconnect_socket_client():
-                            logger.critical("Failed to reconnect - service may be degraded")
-                        
-                except KeyboardInterrupt:
-                    logger.info("Received shutdown signal")
-                    break
-                except Exception as e:
-                    logger.error(f"Error in main loop: {e}")
-                    time.sleep(10)
+            # Block until shutdown; reconnects are handled by the Socket Mode client
+            try:
+                shutdown_event.wait()
+            except KeyboardInterrupt:
+                logger.info("Received shutdown signal")
             
         except Exception as e:
-            logger.error(f"❌ Failed to connect Socket Mode client: {e}")
+            logger.error("❌ Failed to connect Socket Mode client: %s", e)
             raise
         
     except Exception as e:
-        logger.error(f"❌ Bot failed to start: {e}")
+        logger.error("❌ Bot failed to start: %s", e)
         raise
     finally:
         # Cleanup
         shutdown_event.set()
-        logger.info("🛑 Bot shutting down")
\ No newline at end of file
+        logger.info("🛑 Bot shutting down")
+        if socket_mode_client is not None:
+            # Also stops the client's message workers and connection monitor threads
+            try:
+                socket_mode_client.close()
+            except Exception as e:
+                logger.debug("Socket Mode close failed: %s", e)
+        EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        POST_EXECUTOR.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,69 @@ This adapter manages asyncio event loops, thread safety, and message serializati
 async LangChain agent work seamlessly in a synchronous Slack bot environment.
 """
 
-import json
 import asyncio
+import concurrent.futures
+import logging
 import threading
-from typing import Dict, List, Any, Optional, Tuple
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from .malloy_langchain_agent import MalloyLangChainAgent
 from langchain.schema import HumanMessage, AIMessage, BaseMessage
 from ..agents.malloy_langchain_agent import MalloyLangChainAgent, create_malloy_agent
-from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessageChunk, HumanMessageChunk
+import orjson
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
+# One event loop thread runs every agent coroutine, shared by all adapters
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_loop_lock = threading.Lock()
+
+# Message class <-> role in the serialized history; anything else is a system message
+_TYPE_TO_ROLE = {
+    HumanMessage: "user",
+    HumanMessageChunk: "user",
+    AIMessage: "assistant",
+    AIMessageChunk: "assistant",
+}
+_ROLE_TO_CLS = {"user": HumanMessage, "assistant": AIMessage}
+
+
+# Answers to opening questions are reused for repeats of the same question
+RESPONSE_CACHE_TTL = 300.0
+RESPONSE_CACHE_SIZE = 128
+
+
+def _get_shared_loop() -> asyncio.AbstractEventLoop:
+    """Return the agents' event loop, starting it on a daemon thread on first use"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            # uvloop, where installed, is a faster drop-in for the default loop
+            loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="langchain-agent-loop", daemon=True).start()
+            _shared_loop = loop
+        return _shared_loop
+
+
+def _log_save_failure(future: "concurrent.futures.Future[None]"):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Error saving conversation: %s", future.exception())
+
+
+def _has_text(content: Any) -> bool:
+    return isinstance(content, str) and bool(content.strip())
+
+
+def _normalize_question(question: str) -> str:
+    """Cache key for a question: case, spacing and trailing punctuation don't matter"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
 
 
 class LangChainCompatibilityAdapter:
@@ -21,135 +76,207 @@ class LangChainCompatibilityAdapter:
     Synchronous wrapper for the async MalloyLangChainAgent.
     
     Handles:
-    - Event loop management for async operations in sync context
-    - Thread-safe execution using ThreadPoolExecutor
+    - A dedicated event loop thread for the async agent
+    - Thread-safe entry points; questions from any thread run concurrently on the shared loop
     - Message serialization between LangChain objects and simple dicts
     - Tool interface standardization for the Slack bot
     """
     def __init__(self, **kwargs):
         self.agent_kwargs = kwargs
-        # The agent is created just-in-time to ensure it's in the right thread context.
+        # The agent is created just-in-time, on the loop below, by the first question.
         self.agent: Optional[MalloyLangChainAgent] = None
-        self.loop: Optional[asyncio.AbstractEventLoop] = None
-        print("🔍 DEBUG: LangChainCompatibilityAdapter initialized.")
+        self._setup_future: Optional["concurrent.futures.Future[MalloyLangChainAgent]"] = None
+        # The agent's tools are fixed once it is set up, so their schemas are built once
+        self._openai_tools_cache: Optional[List[Dict[str, Any]]] = None
+        self._tool_by_name: Dict[str, Any] = {}
+        # normalized question -> (time.monotonic() when answered, answer), oldest first
+        self._response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.loop = _get_shared_loop()
+        # Only the first caller sets the agent up; questions then run concurrently on the loop
+        self._lock = threading.Lock()
+        logger.debug("LangChainCompatibilityAdapter initialized.")
+
+    def prewarm(self):
+        """Start setting up the agent in the background so the first question doesn't wait for it"""
+        with self._lock:
+            if self.agent is None and self._setup_future is None:
+                logger.debug("Prewarming agent in adapter.")
+                self._setup_future = self._start_setup()
+
+    def _start_setup(self) -> "concurrent.futures.Future[MalloyLangChainAgent]":
+        # create_malloy_agent also runs agent.setup()
+        return asyncio.run_coroutine_threadsafe(create_malloy_agent(**self.agent_kwargs), self.loop)
 
     def _setup_agent_if_needed(self):
-        """Initializes the agent and its setup in a new event loop if not already done."""
+        """Creates and sets up the agent on the adapter's event loop if not already done."""
         if self.agent is None:
-            print("🔍 DEBUG: First-time setup for agent in adapter.")
-            
-            # Check if we're already in an async context
+            if self._setup_future is None:
+                logger.debug("First-time setup for agent in adapter.")
+                self._setup_future = self._start_setup()
             try:
-                # If we're in an async context, we need to run in a thread
-                current_loop = asyncio.get_running_loop()
-                print("🔍 DEBUG: Detected running event loop, using thread executor")
-                
-                def setup_in_thread():
-                    # Create new loop in this thread
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    try:
-                        agent = new_loop.run_until_complete(create_malloy_agent(**self.agent_kwargs))
-                        new_loop.run_until_complete(agent.setup())
-                        return agent, new_loop
-                    except Exception as e:
-                        new_loop.close()
-                        raise e
-                
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(setup_in_thread)
-                    self.agent, self.loop = future.result(timeout=60)
-                    
-            except RuntimeError:
-                # No event loop running, we can create one normally
-                print("🔍 DEBUG: No running event loop detected, creating new one")
-                self.loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(self.loop)
-                
-                self.agent = self.loop.run_until_complete(create_malloy_agent(**self.agent_kwargs))
-                self.loop.run_until_complete(self.agent.setup())
-                
-            print("🔍 DEBUG: Agent setup complete in adapter.")
+                self.agent = self._setup_future.result(timeout=60)
+            finally:
+                # A failed setup is started over by the next question
+                self._setup_future = None
+            self._tool_by_name = {tool.name: tool for tool in self.agent.tools}
+            logger.debug("Agent setup complete in adapter.")
 
     def _serialize_history(self, messages: List[BaseMessage]) -> List[Dict[str, Any]]:
-        serialized = []
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                role = "user"
-            elif isinstance(msg, AIMessage):
-                role = "assistant"
-            else:
-                role = "system"
-            
-            # Preserve the tool_data if it exists
-            content = {
-                "content": msg.content,
-                "additional_kwargs": msg.additional_kwargs
+        # Preserve the tool_data (additional_kwargs) if it exists
+        return [
+            {
+                "role": _TYPE_TO_ROLE.get(type(msg), "system"),
+                "content": {"content": msg.content, "additional_kwargs": msg.additional_kwargs}
             }
-            serialized.append({"role": role, "content": content})
-        return serialized
+            for msg in messages
+        ]
 
     def _deserialize_history(self, history: List[Dict[str, Any]]) -> List[BaseMessage]:
-        deserialized = []
-        for msg in history:
-            role = msg.get("role")
-            content_data = msg.get("content", {})
-            content = content_data.get("content", "")
-            kwargs = content_data.get("additional_kwargs", {})
-
-            # Skip messages with empty content to avoid Claude API errors
-            if not content or content.strip() == "":
-                print(f"🔍 DEBUG: Skipping empty message with role {role}")
-                continue
+        # Messages with empty content are skipped to avoid Claude API errors, as are
+        # system messages, which the agent's prompt provides
+        return [
+            _ROLE_TO_CLS[msg["role"]](
+                content=msg["content"]["content"],
+                additional_kwargs=msg["content"].get("additional_kwargs", {})
+            )
+            for msg in history
+            if msg.get("role") in _ROLE_TO_CLS and _has_text(msg.get("content", {}).get("content"))
+        ]
 
-            if role == "user":
-                deserialized.append(HumanMessage(content=content))
-            elif role == "assistant":
-                deserialized.append(AIMessage(content=content, additional_kwargs=kwargs))
-        return deserialized
-
-    def process_user_question(self, user_question: str, history: Optional[List[Dict[str, Any]]] = None, session_id: Optional[str] = None) -> Tuple[bool, str, List[Dict[str, Any]]]:
+    def process_user_question(
+        self,
+        user_question: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None,
+        on_partial: Optional[Callable[[str], None]] = None
+    ) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        """Answer a question synchronously
+        
+        Questions from different threads run concurrently on the agent's loop;
+        each session_id has its own LangGraph checkpoint. on_partial, if given,
+        is called from the agent's thread with the response text generated so
+        far while the answer streams in.
+        """
         try:
-            self._setup_agent_if_needed()
+            with self._lock:
+                self._setup_agent_if_needed()
             
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(self._run_question_in_new_loop, user_question, history, session_id)
+            future = asyncio.run_coroutine_threadsafe(
+                self._arun_question(user_question, history, session_id, on_partial), self.loop
+            )
+            try:
                 success, response, final_history_obj = future.result(timeout=300)
-                final_history = self._serialize_history(final_history_obj)
-                return success, response, final_history
+            except BaseException:
+                # Don't leave a timed out question running on the loop
+                future.cancel()
+                raise
+            final_history = self._serialize_history(final_history_obj)
+            return success, response, final_history
         except Exception as e:
             error_msg = f"Error in LangChain processing: {str(e)}"
-            print(f"🔍 DEBUG: Error in process_user_question: {e}")
+            logger.exception("Error in process_user_question: %s", e)
             return False, error_msg, []
 
-    def _run_question_in_new_loop(self, question: str, history: Optional[List[Dict[str, Any]]], session_id: Optional[str] = None) -> Tuple[bool, str, List[BaseMessage]]:
-        """This runs in a separate thread and uses the loop created during setup."""
-        if not self.agent or not self.loop:
-            raise RuntimeError("Adapter not initialized. Call _setup_agent_if_needed first.")
+    def process_questions_batch(
+        self,
+        questions: List[Tuple[str, Optional[str]]],
+        max_concurrency: int = 8
+    ) -> List[Tuple[bool, str, List[Dict[str, Any]]]]:
+        """Answer several independent questions concurrently
         
-        # Set the event loop for this thread
-        asyncio.set_event_loop(self.loop)
+        Args:
+            questions: (question, session_id) pairs; a None session_id gets a
+                new session of its own so independent questions stay apart
+            max_concurrency: Most questions in flight at once, to stay under
+                the LLM provider's rate limits
+                
+        Returns:
+            One (success, response, history) result per question, in order
+        """
+        try:
+            with self._lock:
+                self._setup_agent_if_needed()
+            
+            # The agent's batch bounds concurrency and isolates sessions; each
+            # question still goes through the response cache
+            batch = self.agent.process_questions_batch(
+                [question for question, _ in questions],
+                [session_id for _, session_id in questions],
+                max_concurrency,
+                answer=lambda question, session_id: self._arun_question(question, None, session_id)
+            )
+            future = asyncio.run_coroutine_threadsafe(batch, self.loop)
+            try:
+                results = future.result(timeout=300)
+            except BaseException:
+                future.cancel()
+                raise
+        except Exception as e:
+            error_msg = f"Error in LangChain processing: {str(e)}"
+            logger.exception("Error in process_questions_batch: %s", e)
+            return [(False, error_msg, [])] * len(questions)
         
+        return [
+            (False, f"Error in LangChain processing: {str(result)}", [])
+            if isinstance(result, Exception)
+            else (result[0], result[1], self._serialize_history(result[2]))
+            for result in results
+        ]
+
+    async def _arun_question(self, question: str, history: Optional[List[Dict[str, Any]]], session_id: Optional[str] = None, on_partial: Optional[Callable[[str], None]] = None) -> Tuple[bool, str, List[BaseMessage]]:
+        """Runs on the adapter's event loop."""
         try:
             # Note: LangGraph agents handle conversation history internally through checkpoints
             # No need to manually manage memory like with the old LangChain agents
             
             # Use provided session_id or fall back to agent's default
             effective_session_id = session_id if session_id else self.agent.session_id
-            print(f"🔍 DEBUG: Using session_id: {effective_session_id} for question: {question}")
+            logger.debug("Using session_id: %s for question: %s", effective_session_id, question)
+            
+            # Only a conversation's opening question can be answered from the cache;
+            # follow-ups depend on what was said before
+            cache_key = None
+            if not self.agent.has_conversation(effective_session_id):
+                cache_key = _normalize_question(question)
+                cached_response = self._get_cached_response(cache_key)
+                if cached_response is not None:
+                    logger.debug("Answering from response cache: %s", question)
+                    # Follow-ups in this session still see the exchange
+                    await self.agent.remember_exchange(question, cached_response, effective_session_id)
+                    return True, cached_response, self.agent.get_conversation_history()
             
-            success, response, _ = self.loop.run_until_complete(self.agent.process_question(question, session_id=effective_session_id))
+            success, response, _ = await self.agent.process_question(question, session_id=effective_session_id, on_partial=on_partial)
+            if success and cache_key is not None:
+                self._cache_response(cache_key, response)
             final_history_obj = self.agent.get_conversation_history()
             return success, response, final_history_obj
         except Exception as e:
-            print(f"🔍 DEBUG: Error in _run_question_in_new_loop: {e}")
+            logger.debug("Error in _arun_question: %s", e)
             raise e
     
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        entry = self._response_cache.get(cache_key)
+        if entry is None:
+            return None
+        answered_at, response = entry
+        if time.monotonic() - answered_at > RESPONSE_CACHE_TTL:
+            del self._response_cache[cache_key]
+            return None
+        return response
+
+    def _cache_response(self, cache_key: str, response: str):
+        self._response_cache[cache_key] = (time.monotonic(), response)
+        self._response_cache.move_to_end(cache_key)
+        while len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """Get available tools in OpenAI function format - for compatibility"""
         
         if not self.agent:
             return []
+        if self._openai_tools_cache is not None:
+            return self._openai_tools_cache
         
         try:
             # Convert LangChain tools to OpenAI function format
@@ -177,10 +304,11 @@ class LangChainCompatibilityAdapter:
                 
                 openai_tools.append(tool_schema)
             
+            self._openai_tools_cache = openai_tools
             return openai_tools
             
         except Exception as e:
-            print(f"Error getting available tools: {e}")
+            logger.error("Error getting available tools: %s", e)
             return []
     
     def call_tool(self, tool_name: str, **kwargs) -> str:
@@ -190,13 +318,7 @@ class LangChainCompatibilityAdapter:
             return f"Error: LangChain agent not initialized"
         
         try:
-            # Find the tool
-            tool = None
-            for t in self.agent.tools:
-                if t.name == tool_name:
-                    tool = t
-                    break
-            
+            tool = self._tool_by_name.get(tool_name)
             if not tool:
                 return f"Error: Tool '{tool_name}' not found"
             
@@ -205,7 +327,7 @@ class LangChainCompatibilityAdapter:
             
             # Format result as JSON string for compatibility
             if isinstance(result, dict):
-                return json.dumps(result, indent=2)
+                return orjson.dumps(result, option=orjson.OPT_INDENT_2, default=str).decode()
             else:
                 return str(result)
                 
@@ -234,21 +356,48 @@ class LangChainCompatibilityAdapter:
         
         return base_info
     
-    def clear_conversation(self):
-        """Clear conversation history"""
-        if self.agent:
-            try:
-                self.agent.clear_conversation()
-            except Exception as e:
-                print(f"Error clearing conversation: {e}")
+    def clear_conversation(self, session_id: Optional[str] = None):
+        """Clear one session's conversation history, or all of it if no session is given
+        
+        Runs on the adapter's event loop, which owns the agent's checkpointer, and
+        returns without waiting for it.
+        """
+        self.loop.call_soon_threadsafe(self._clear_conversation, session_id)
     
-    def save_conversation(self, filepath: str):
-        """Save conversation history to file"""
+    def _clear_conversation(self, session_id: Optional[str]):
+        """Runs on the adapter's event loop."""
+        if session_id is None:
+            # Cached answers aren't tied to a session, so only a full reset drops them
+            self._response_cache.clear()
         if self.agent:
             try:
-                self.agent.save_conversation(filepath)
+                self.agent.clear_conversation(session_id)
             except Exception as e:
-                print(f"Error saving conversation: {e}")
+                logger.error("Error clearing conversation: %s", e)
+    
+    def save_conversation(self, filepath: str, session_id: Optional[str] = None) -> Optional["concurrent.futures.Future[None]"]:
+        """Save a session's conversation history to a JSON file in the background
+        
+        Returns:
+            A future that completes once the file is written, or None if the
+            agent isn't set up yet
+        """
+        if not self.agent:
+            return None
+        future = asyncio.run_coroutine_threadsafe(self._asave_conversation(filepath, session_id), self.loop)
+        future.add_done_callback(_log_save_failure)
+        return future
+
+    async def _asave_conversation(self, filepath: str, session_id: Optional[str]):
+        """Runs on the adapter's event loop; the file write runs in a worker thread."""
+        history = self._serialize_history(self.agent.get_session_messages(session_id))
+        data = orjson.dumps(history, option=orjson.OPT_INDENT_2, default=str)
+        
+        def write():
+            with open(filepath, "wb") as f:
+                f.write(data)
+        
+        await asyncio.to_thread(write)
     
     # Properties for compatibility
     @property
@@ -5,24 +5,111 @@ A LangChain agent that can query Malloy data models and generate charts.
 Now uses SimpleMCPClient which follows proper MCP SDK patterns.
 """
 
-import json
+import asyncio
 import logging
 import os
-from typing import Dict, Any, List, Tuple, Optional
+import re
+import uuid
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Any, List, Tuple, Optional
+
+import orjson
 
 # Import LangChain components
-from langchain_community.llms import OpenAI  # Fixed: Import from langchain-community instead of deprecated langchain.llms
-from langchain_anthropic import ChatAnthropic
 from langgraph.prebuilt import create_react_agent  # Updated: Use LangGraph for agents in LangChain 0.3.x
 from langgraph.checkpoint.memory import MemorySaver  # Updated: Use LangGraph memory
 from langchain.prompts import PromptTemplate
 from langchain.callbacks.manager import CallbackManagerForChainRun
 from langchain.schema import AgentAction, AgentFinish
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
 
 from ..tools.dynamic_malloy_tools import MalloyToolsFactory
 from ..prompts.malloy_prompts import MalloyPromptTemplates
 from ..clients.simple_mcp_client import SimpleMCPClient
 
+# A JSON object response, optionally wrapped in a ```json markdown fence
+_JSON_RESPONSE_RE = re.compile(r'\A\s*(?:```(?:json)?\s*)?(\{.*\})\s*(?:```)?\s*\Z', re.DOTALL)
+# A chart_url key/value pair anywhere in a response, quoted or not
+_CHART_URL_RE = re.compile(r'chart_url["\']?\s*:\s*["\']([^"\']+)["\']')
+# Context budget for each model call; the oldest turns of long threads are left out
+MAX_CONTEXT_TOKENS = 20_000
+# Messages a session may checkpoint; past this it is cut back to the newest half
+MAX_CHECKPOINT_MESSAGES = 80
+
+
+def _trim_context(state: Dict[str, Any]) -> Dict[str, Any]:
+    """LangGraph pre-model hook: send the model only the most recent whole turns
+    
+    The checkpointed history is bounded separately, by _compact_session.
+    """
+    messages = state["messages"]
+    trimmed = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        max_tokens=MAX_CONTEXT_TOKENS,
+        start_on="human",
+        include_system=True
+    )
+    # A single turn over budget is sent whole rather than not at all
+    return {"llm_input_messages": trimmed or messages}
+
+
+@lru_cache(maxsize=256)
+def _find_chart_result(response: str) -> Optional[Dict[str, Any]]:
+    """Chart information in a response, memoized since responses get re-checked"""
+    # Look for chart_url and status: success in the response. Both patterns
+    # below are case-sensitive, so a plain substring probe on the original
+    # text rules out most responses without lowercasing them.
+    if "chart_url" in response and "status" in response.lower():
+        # Try to parse as JSON only if it looks like a JSON chart payload
+        json_match = _JSON_RESPONSE_RE.match(response) if '"chart_url"' in response else None
+        if json_match:
+            try:
+                data = orjson.loads(json_match.group(1))
+                if data.get("chart_url") and data.get("status") == "success":
+                    return data
+            except orjson.JSONDecodeError:
+                pass  # Not valid JSON after all - fall back to the string check
+        
+        # Also check for chart_url in string format
+        url_match = _CHART_URL_RE.search(response)
+        if url_match:
+            return {"chart_url": url_match.group(1), "status": "success"}
+    
+    return None
+
+
+@lru_cache(maxsize=256)
+def _find_tools_used(response: str) -> Tuple[str, ...]:
+    """Names of tools a response suggests were used, memoized like _find_chart_result"""
+    tools_used = []
+    response_lower = response.lower()
+    
+    # Check for chart generation
+    if "chart_url" in response_lower:
+        tools_used.append("generate_chart")
+    
+    # Check for Malloy operations
+    malloy_keywords = ["malloy", "query", "project", "package", "model"]
+    if any(keyword in response_lower for keyword in malloy_keywords):
+        tools_used.append("malloy_tools")
+    
+    return tuple(tools_used)
+
+
+def _content_text(content: Any) -> str:
+    """Return the text of a message content, which may be a list of content blocks"""
+    if isinstance(content, str):
+        return content
+    if not isinstance(content, list):
+        return ""
+    return "".join(
+        block.get("text", "") for block in content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
 
 class MalloyLangChainAgent:
     """
@@ -32,6 +119,9 @@ class MalloyLangChainAgent:
     avoiding the async context management issues we had before.
     """
     
+    # mcp_url -> MCP client shared by every agent talking to that server
+    _MCP_CLIENT_POOL: Dict[str, SimpleMCPClient] = {}
+    
     def __init__(
         self,
         mcp_url: str,
@@ -59,10 +149,11 @@ class MalloyLangChainAgent:
         
         # Set up logging
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
         
-        # Create the simple MCP client
-        self.mcp_client = SimpleMCPClient(mcp_url)
+        # Share one MCP client, and so its connection pool, per server
+        if mcp_url not in self._MCP_CLIENT_POOL:
+            self._MCP_CLIENT_POOL[mcp_url] = SimpleMCPClient(mcp_url)
+        self.mcp_client = self._MCP_CLIENT_POOL[mcp_url]
         
         self.logger.info(f"MalloyLangChainAgent initialized with {llm_provider} {model_name}")
     
@@ -74,16 +165,16 @@ class MalloyLangChainAgent:
             # Initialize the LLM
             self._setup_llm()
             
-            # Test MCP connection
-            connected = await self.mcp_client.test_connection()
+            # Test MCP connection while the tools are created from the server's definitions
+            tools_factory = MalloyToolsFactory(self.mcp_url, self.mcp_client)
+            connected, self.tools = await asyncio.gather(
+                self.mcp_client.test_connection(),
+                tools_factory.create_tools()
+            )
             if not connected:
                 self.logger.error("Failed to connect to MCP server")
                 return False
             
-            # Create tools using the factory
-            tools_factory = MalloyToolsFactory(self.mcp_url)
-            self.tools = await tools_factory.create_tools()
-            
             self.logger.info(f"Created {len(self.tools)} tools: {[tool.name for tool in self.tools]}")
             
             # Set up memory
@@ -100,11 +191,16 @@ class MalloyLangChainAgent:
             return False
     
     def _setup_llm(self):
-        """Initialize the appropriate LLM"""
+        """Initialize the appropriate LLM
+        
+        Provider SDKs are imported lazily so only the selected one is loaded.
+        """
         if self.llm_provider == "anthropic":
             if not self.anthropic_api_key:
                 raise ValueError("Anthropic API key is required for Anthropic models")
             
+            from langchain_anthropic import ChatAnthropic
+            
             self.llm = ChatAnthropic(
                 model=self.model_name,
                 api_key=self.anthropic_api_key,
@@ -118,9 +214,11 @@ class MalloyLangChainAgent:
             if not self.openai_api_key:
                 raise ValueError("OpenAI API key is required for OpenAI models")
             
-            self.llm = OpenAI(
-                model_name=self.model_name,
-                openai_api_key=self.openai_api_key,
+            from langchain_openai import ChatOpenAI
+            
+            self.llm = ChatOpenAI(
+                model=self.model_name,
+                api_key=self.openai_api_key,
                 temperature=0.1,
                 max_tokens=4000,
                 timeout=120,
@@ -133,18 +231,43 @@ class MalloyLangChainAgent:
     
     def _setup_agent(self):
         """Create the ReAct agent using LangGraph"""
+        model = self.llm
+        if self.llm_provider == "anthropic":
+            from langchain_anthropic.chat_models import convert_to_anthropic_tool
+            
+            # The tool definitions are identical in every request, so the last one
+            # is a cache breakpoint shared by all conversations
+            tool_definitions = [convert_to_anthropic_tool(tool) for tool in self.tools]
+            if tool_definitions:
+                tool_definitions[-1]["cache_control"] = {"type": "ephemeral"}
+            
+            # Make the end of each request an Anthropic prompt cache breakpoint. The
+            # next ReAct step or follow-up question re-sends the same tools and
+            # history as its prefix, which is then read from the cache.
+            model = self.llm.bind_tools(tool_definitions).bind(cache_control={"type": "ephemeral"})
+        
         # Create the agent using LangGraph's create_react_agent
         # No need for complex prompt templates - LangGraph handles this internally
         self.agent_executor = create_react_agent(
-            model=self.llm,
+            model=model,
             tools=self.tools,
-            checkpointer=self.memory  # LangGraph uses checkpointer for memory
+            checkpointer=self.memory,  # LangGraph uses checkpointer for memory
+            pre_model_hook=_trim_context
         )
         
         self.logger.info("LangGraph agent created successfully")
     
-    async def process_question(self, question: str, session_id: Optional[str] = None) -> Tuple[bool, str, Dict[str, Any]]:
-        """Process a user question and return success status, response, and metadata"""
+    async def process_question(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        on_partial: Optional[Callable[[str], None]] = None
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """Process a user question and return success status, response, and metadata
+        
+        If on_partial is given the agent's output is streamed, and on_partial is
+        called with the text generated so far for the current AI message.
+        """
         try:
             # Use provided session_id or fall back to instance default
             effective_session_id = session_id if session_id else self.session_id
@@ -157,46 +280,54 @@ class MalloyLangChainAgent:
             # Each conversation needs a unique thread_id for memory
             config = {"configurable": {"thread_id": effective_session_id}}
             
-            self.logger.debug("=" * 60)
-            self.logger.debug("🤖 AGENT EXECUTION START")
-            self.logger.debug(f"📝 User Question: {question}")
-            self.logger.debug(f"🧵 Thread ID: {effective_session_id}")
-            self.logger.debug(f"🔧 Available Tools: {[tool.name for tool in self.tools]}")
-            self.logger.debug("=" * 60)
+            debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+            if debug_enabled:
+                self.logger.debug("=" * 60)
+                self.logger.debug("🤖 AGENT EXECUTION START")
+                self.logger.debug(f"📝 User Question: {question}")
+                self.logger.debug(f"🧵 Thread ID: {effective_session_id}")
+                self.logger.debug(f"🔧 Available Tools: {[tool.name for tool in self.tools]}")
+                self.logger.debug("=" * 60)
             
             # Execute the agent with the new message format
-            result = self.agent_executor.invoke(
-                {"messages": [("human", question)]},
-                config
-            )
+            inputs = {"messages": [("human", question)]}
+            if on_partial is None:
+                result = await self.agent_executor.ainvoke(inputs, config)
+            else:
+                result = await self._stream_agent(inputs, config, on_partial)
+            messages = result.get("messages") or []
             
-            self.logger.debug("=" * 60)
-            self.logger.debug("🎯 AGENT EXECUTION RESULT")
-            self.logger.debug(f"📊 Total Messages: {len(result.get('messages', []))}")
+            if debug_enabled:
+                self.logger.debug("=" * 60)
+                self.logger.debug("🎯 AGENT EXECUTION RESULT")
+                self.logger.debug(f"📊 Total Messages: {len(messages)}")
             
-            # Log all messages in the conversation
-            for i, msg in enumerate(result.get("messages", [])):
-                role = msg.__class__.__name__
-                content = msg.content[:200] + "..." if len(msg.content) > 200 else msg.content
-                self.logger.debug(f"💬 Message {i+1} ({role}): {content}")
+                # Log all messages in the conversation
+                for i, msg in enumerate(messages):
+                    role = msg.__class__.__name__
+                    content = _content_text(msg.content)
+                    if len(content) > 200:
+                        content = content[:200] + "..."
+                    self.logger.debug(f"💬 Message {i+1} ({role}): {content}")
                 
-                # Log tool calls if present
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        self.logger.debug(f"🔧 Tool Call: {tool_call.get('name', 'unknown')} with args: {tool_call.get('args', {})}")
+                    # Log tool calls if present
+                    if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                        for tool_call in msg.tool_calls:
+                            self.logger.debug(f"🔧 Tool Call: {tool_call.get('name', 'unknown')} with args: {tool_call.get('args', {})}")
             
-            self.logger.debug("=" * 60)
+                self.logger.debug("=" * 60)
             
             # Extract the response from the last message
-            if "messages" in result and result["messages"]:
-                last_message = result["messages"][-1]
-                response = last_message.content
-                self.logger.debug(f"✅ Final Response: {response}")
+            if messages:
+                # With tools bound, Anthropic's final message may be a list of content blocks
+                response = _content_text(messages[-1].content)
+                self.logger.debug("✅ Final Response: %s", response)
             else:
                 response = "No response generated"
                 self.logger.warning("⚠️ No messages in result")
             
             self.logger.info(f"Agent response generated: {len(response)} chars")
+            await self._compact_session(effective_session_id, messages)
             
             # Check if this looks like a chart result
             if self._extract_chart_result(response):
@@ -208,7 +339,7 @@ class MalloyLangChainAgent:
                 "model": self.model_name,
                 "provider": self.llm_provider,
                 "tools_used": self._extract_tools_used(response),
-                "message_count": len(result.get("messages", []))
+                "message_count": len(messages)
             }
             
             return True, response, metadata
@@ -223,59 +354,92 @@ class MalloyLangChainAgent:
             
             return False, fallback_response, {"error": str(e)}
     
-    def _extract_chart_result(self, response: str) -> Optional[Dict[str, Any]]:
+    async def process_questions_batch(
+        self,
+        questions: List[str],
+        session_ids: Optional[List[Optional[str]]] = None,
+        max_concurrency: int = 8,
+        answer: Optional[Callable[[str, str], Awaitable[Any]]] = None
+    ) -> List[Any]:
+        """Process independent questions concurrently, at most max_concurrency at a time
+        
+        Each question runs in its own session, a new one unless session_ids
+        gives one, so their conversations stay apart. answer(question, session_id)
+        replaces process_question for callers that wrap it, e.g. with a cache.
+        Results are in question order; an exception raised for a question is
+        returned in place of its result.
+        """
+        if session_ids is None:
+            session_ids = [None] * len(questions)
+        session_ids = [session_id or f"batch-{uuid.uuid4().hex}" for session_id in session_ids]
+        if answer is None:
+            answer = lambda question, session_id: self.process_question(question, session_id=session_id)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def process(question: str, session_id: str) -> Any:
+            async with semaphore:
+                return await answer(question, session_id)
+        
+        return await asyncio.gather(
+            *(process(q, s) for q, s in zip(questions, session_ids)),
+            return_exceptions=True
+        )
+    
+    async def _stream_agent(self, inputs: Dict[str, Any], config: Dict[str, Any], on_partial: Callable[[str], None]) -> Dict[str, Any]:
+        """Run the agent with token streaming and return its final state, like invoke()"""
+        result: Dict[str, Any] = {}
+        message_id = None
+        text = ""
+        
+        async for mode, chunk in self.agent_executor.astream(inputs, config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            
+            message, _ = chunk
+            if not isinstance(message, AIMessageChunk):
+                continue
+            # Each model turn (e.g. before and after a tool call) is a new message
+            if message.id != message_id:
+                message_id = message.id
+                text = ""
+            delta = _content_text(message.content)
+            if delta:
+                text += delta
+                on_partial(text)
+        
+        return result
+    
+    def _extract_chart_result(self, response: Any) -> Optional[Dict[str, Any]]:
         """Extract chart information from the response"""
         try:
-            # Look for chart_url and status: success in the response
-            if "chart_url" in response.lower() and "status" in response.lower():
-                # Try to parse as JSON if it looks like a JSON response
-                if response.strip().startswith('{') and response.strip().endswith('}'):
-                    data = json.loads(response)
-                    if data.get("chart_url") and data.get("status") == "success":
-                        return data
-                
-                # Also check for chart_url in string format
-                import re
-                url_match = re.search(r'chart_url["\']?\s*:\s*["\']([^"\']+)["\']', response)
-                if url_match:
-                    return {"chart_url": url_match.group(1), "status": "success"}
-            
-            return None
-            
+            # The memoized helper needs a hashable string, not content blocks
+            chart = _find_chart_result(_content_text(response))
         except Exception as e:
-            self.logger.debug(f"Error extracting chart result: {e}")
+            self.logger.debug("Error extracting chart result: %s", e)
             return None
+        # The cached dict is shared between calls, so hand out a copy
+        return dict(chart) if chart else None
     
-    def _extract_tools_used(self, response: str) -> List[str]:
+    def _extract_tools_used(self, response: Any) -> List[str]:
         """Extract names of tools that were used"""
-        tools_used = []
-        
-        # Check for chart generation
-        if "chart_url" in response.lower():
-            tools_used.append("generate_chart")
-        
-        # Check for Malloy operations
-        malloy_keywords = ["malloy", "query", "project", "package", "model"]
-        if any(keyword in response.lower() for keyword in malloy_keywords):
-            tools_used.append("malloy_tools")
-        
-        return tools_used
+        return list(_find_tools_used(_content_text(response)))
     
     def _generate_fallback_response(self, question: str, error: str) -> str:
         """Generate a helpful fallback response when the agent fails"""
         # If the question mentions charts, try to help with chart generation
         if any(word in question.lower() for word in ["chart", "graph", "plot", "visualiz"]):
-            return json.dumps({
+            return orjson.dumps({
                 "text": "I encountered an error while trying to create a chart. Please try rephrasing your request or ensure you've first retrieved the data you want to visualize.",
                 "error": error,
                 "suggestion": "Try asking for data first, then request a chart of that specific data."
-            })
+            }).decode()
         
         # General fallback
-        return json.dumps({
+        return orjson.dumps({
             "text": f"I encountered an error while processing your question: {error}",
             "suggestion": "Please try rephrasing your question or check if the Malloy server is accessible."
-        })
+        }).decode()
     
     def save_conversation(self, question: str, response: str, metadata: Dict[str, Any]):
         """Save conversation for debugging/analysis"""
@@ -296,6 +460,69 @@ class MalloyLangChainAgent:
         except Exception as e:
             self.logger.error(f"Error saving conversation: {e}")
     
+    def get_session_messages(self, session_id: Optional[str] = None) -> List[Any]:
+        """Messages checkpointed for a session (default: this agent's session), oldest first"""
+        if self.agent_executor is None:
+            return []
+        config = {"configurable": {"thread_id": session_id or self.session_id}}
+        return self.agent_executor.get_state(config).values.get("messages", [])
+    
+    def clear_conversation(self, session_id: Optional[str] = None):
+        """Forget a session's messages, or those of every session if none is given"""
+        if self.memory is None:
+            return
+        if session_id is not None:
+            self.memory.delete_thread(session_id)
+        else:
+            self.memory = MemorySaver()
+            self._setup_agent()
+    
+    def has_conversation(self, session_id: str) -> bool:
+        """Check whether the checkpointer already holds messages for a session"""
+        if self.memory is None:
+            return False
+        return self.memory.get_tuple({"configurable": {"thread_id": session_id}}) is not None
+    
+    async def remember_exchange(self, question: str, response: str, session_id: str):
+        """Record a question and its answer in a session without running the agent"""
+        config = {"configurable": {"thread_id": session_id}}
+        await self.agent_executor.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=question), AIMessage(content=response)]},
+            as_node="agent"
+        )
+        state = await self.agent_executor.aget_state(config)
+        await self._compact_session(session_id, state.values.get("messages", []))
+    
+    async def _compact_session(self, session_id: str, messages: List[Any]):
+        """Keep only a session's most recent whole turns checkpointed
+        
+        MemorySaver keeps every checkpoint a thread ever wrote, each with its
+        own copy of the messages. Once a session passes MAX_CHECKPOINT_MESSAGES
+        its thread is re-seeded with the turns in the newest half, which drops
+        the older checkpoints too and bounds the memory a long thread holds.
+        Cutting back to half means this happens every few dozen messages
+        rather than on every turn.
+        """
+        if len(messages) <= MAX_CHECKPOINT_MESSAGES or self.memory is None:
+            return
+        # Start on a question so tool calls are never split from their results
+        start = len(messages) - MAX_CHECKPOINT_MESSAGES // 2
+        while start < len(messages) and not isinstance(messages[start], HumanMessage):
+            start += 1
+        if start == len(messages):
+            return
+        try:
+            self.memory.delete_thread(session_id)
+            await self.agent_executor.aupdate_state(
+                {"configurable": {"thread_id": session_id}},
+                {"messages": messages[start:]},
+                as_node="agent"
+            )
+            self.logger.debug("Compacted session %s to %d messages", session_id, len(messages) - start)
+        except Exception as e:
+            self.logger.warning("Could not compact session %s: %s", session_id, e)
+    
     def get_conversation_history(self):
         """Get conversation history for the compatibility adapter"""
         # LangGraph manages conversation history internally through checkpoints
@@ -2,17 +2,38 @@
 Simple MCP Client following official SDK patterns.
 
 This client follows the recommended patterns from the MCP Python SDK documentation,
-creating new sessions per operation rather than trying to reuse them.
+creating new sessions per operation rather than trying to reuse them. The HTTP
+connections underneath those sessions are pooled and kept alive between operations.
 """
 import asyncio
-import json
 import logging
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
 
+import httpx
+import orjson
+
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 
+# Connection pool limits for the HTTP transport shared by all sessions of a client
+MAX_CONNECTIONS = 500
+MAX_KEEPALIVE_CONNECTIONS = 100
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Hands a session's requests to a pooled transport that outlives the session"""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        # Called when each session's client closes; keep the pooled connections open
+        pass
+
 
 class SimpleMCPClient:
     """
@@ -32,14 +53,57 @@ class SimpleMCPClient:
         parsed = urlparse(mcp_url)
         if not parsed.scheme or not parsed.netloc:
             raise ValueError(f"Invalid MCP URL: {mcp_url}")
+        
+        # Connections are bound to the event loop that opened them
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._transport_loop: Optional[asyncio.AbstractEventLoop] = None
             
         self.logger.debug(f"SimpleMCPClient initialized for {mcp_url}")
     
+    def _get_transport(self) -> httpx.AsyncHTTPTransport:
+        """Return the pooled transport for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._transport is None or self._transport_loop is not loop:
+            self._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                )
+            )
+            self._transport_loop = loop
+        return self._transport
+    
+    def _create_http_client(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        auth: Optional[httpx.Auth] = None,
+    ) -> httpx.AsyncClient:
+        """httpx client factory for streamablehttp_client using the pooled transport"""
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=timeout if timeout is not None else httpx.Timeout(30.0),
+            headers=headers,
+            auth=auth,
+            transport=_SharedTransport(self._get_transport()),
+        )
+    
+    def _connect(self):
+        """Open the streamable HTTP streams for one MCP session"""
+        return streamablehttp_client(self.mcp_url, httpx_client_factory=self._create_http_client)
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections"""
+        if self._transport is not None:
+            transport, self._transport = self._transport, None
+            self._transport_loop = None
+            await transport.aclose()
+    
     async def list_projects(self) -> List[Dict[str, Any]]:
         """List all available projects."""
         self.logger.debug("🌐 MCP: Listing projects")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 self.logger.debug("🤝 MCP: Session initialized successfully")
@@ -52,7 +116,6 @@ class SimpleMCPClient:
                 
                 # Parse the result
                 if result.content and len(result.content) > 0:
-                    import json
                     try:
                         content = result.content[0]
                         self.logger.debug(f"📋 MCP: First content item: {content}")
@@ -67,7 +130,7 @@ class SimpleMCPClient:
                             self.logger.debug(f"📝 MCP: Content text: {text_content}")
                         
                         if text_content:
-                            data = json.loads(text_content)
+                            data = orjson.loads(text_content)
                             
                             # Handle different response formats
                             if isinstance(data, list):
@@ -82,7 +145,7 @@ class SimpleMCPClient:
                         else:
                             self.logger.warning("⚠️ MCP: No text content found in response")
                             
-                    except (json.JSONDecodeError, AttributeError) as e:
+                    except (orjson.JSONDecodeError, AttributeError) as e:
                         self.logger.error(f"❌ MCP: Error parsing projects result: {e}")
                         self.logger.debug(f"❌ MCP: Content structure: {content}")
                         
@@ -93,20 +156,19 @@ class SimpleMCPClient:
         """List packages for a given project."""
         self.logger.debug(f"Listing packages for project: {project_name}")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
                 result = await session.call_tool("malloy_packageList", {"projectName": project_name})
                 
                 if result.content and len(result.content) > 0:
-                    import json
                     try:
                         content = result.content[0]
                         if hasattr(content, 'text'):
-                            data = json.loads(content.text)
+                            data = orjson.loads(content.text)
                             return data.get('packages', [])
-                    except (json.JSONDecodeError, AttributeError) as e:
+                    except (orjson.JSONDecodeError, AttributeError) as e:
                         self.logger.error(f"Error parsing packages result: {e}")
                         
                 return []
@@ -115,7 +177,7 @@ class SimpleMCPClient:
         """Get package details including models."""
         self.logger.debug(f"Getting package: {project_name}/{package_name}")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
@@ -125,12 +187,11 @@ class SimpleMCPClient:
                 })
                 
                 if result.content and len(result.content) > 0:
-                    import json
                     try:
                         content = result.content[0]
                         if hasattr(content, 'text'):
-                            return json.loads(content.text)
-                    except (json.JSONDecodeError, AttributeError) as e:
+                            return orjson.loads(content.text)
+                    except (orjson.JSONDecodeError, AttributeError) as e:
                         self.logger.error(f"Error parsing package result: {e}")
                         
                 return {}
@@ -139,7 +200,7 @@ class SimpleMCPClient:
         """Get the raw text content of a model file."""
         self.logger.debug(f"Getting model text: {project_name}/{package_name}/{model_path}")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
@@ -150,13 +211,12 @@ class SimpleMCPClient:
                 })
                 
                 if result.content and len(result.content) > 0:
-                    import json
                     try:
                         content = result.content[0]
                         if hasattr(content, 'text'):
-                            data = json.loads(content.text)
+                            data = orjson.loads(content.text)
                             return data.get('content', '')
-                    except (json.JSONDecodeError, AttributeError) as e:
+                    except (orjson.JSONDecodeError, AttributeError) as e:
                         self.logger.error(f"Error parsing model text result: {e}")
                         
                 return ""
@@ -173,7 +233,7 @@ class SimpleMCPClient:
         """Execute a Malloy query."""
         self.logger.debug(f"Executing query on {project_name}/{package_name}/{model_path}")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
@@ -194,12 +254,11 @@ class SimpleMCPClient:
                 result = await session.call_tool("malloy_executeQuery", args)
                 
                 if result.content and len(result.content) > 0:
-                    import json
                     try:
                         content = result.content[0]
                         if hasattr(content, 'text'):
-                            return json.loads(content.text)
-                    except (json.JSONDecodeError, AttributeError) as e:
+                            return orjson.loads(content.text)
+                    except (orjson.JSONDecodeError, AttributeError) as e:
                         self.logger.error(f"Error parsing query result: {e}")
                         
                 return {}
@@ -209,7 +268,7 @@ class SimpleMCPClient:
         try:
             self.logger.debug(f"🌐 MCP: Testing connection to {self.mcp_url}")
             
-            async with streamablehttp_client(self.mcp_url) as (read, write, _):
+            async with self._connect() as (read, write, _):
                 async with ClientSession(read, write) as session:
                     self.logger.debug("🤝 MCP: Initializing session...")
                     await session.initialize()
@@ -234,7 +293,7 @@ class SimpleMCPClient:
         """Get tool definitions from the MCP server."""
         self.logger.debug("🔧 MCP: Getting tool definitions")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
@@ -259,7 +318,7 @@ class SimpleMCPClient:
         """Execute any MCP tool dynamically with the given arguments."""
         self.logger.debug(f"🔧 Calling MCP tool: {tool_name} with args: {arguments}")
         
-        async with streamablehttp_client(self.mcp_url) as (read, write, _):
+        async with self._connect() as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 
@@ -274,14 +333,14 @@ class SimpleMCPClient:
                         if hasattr(content, 'resource') and hasattr(content.resource, 'text'):
                             # Handle resource responses with JSON text
                             try:
-                                return json.loads(content.resource.text)
-                            except json.JSONDecodeError:
+                                return orjson.loads(content.resource.text)
+                            except orjson.JSONDecodeError:
                                 return {"raw_text": content.resource.text}
                         elif hasattr(content, 'text'):
                             # Handle direct text responses
                             try:
-                                return json.loads(content.text)
-                            except json.JSONDecodeError:
+                                return orjson.loads(content.text)
+                            except orjson.JSONDecodeError:
                                 return {"raw_text": content.text}
                     
                     # Fallback - return the raw result
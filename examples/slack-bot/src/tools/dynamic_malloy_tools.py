@@ -5,16 +5,23 @@ Creates LangChain tools dynamically from MCP server capabilities.
 Now uses SimpleMCPClient which follows proper MCP SDK patterns.
 """
 
-import json
 import logging
-from typing import Dict, Any, List, Type
+import time
+from typing import Dict, Any, List, Optional, Tuple, Type
 
+import orjson
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, create_model
 
 from ..clients.simple_mcp_client import SimpleMCPClient
 from ..tools.quickchart_tool import QuickChartTool
 
+# Tool definitions rarely change, so agents set up within this many seconds of
+# each other share the tools created for their MCP server
+TOOLS_CACHE_TTL = 300.0
+# mcp_url -> (time.monotonic() when created, tools)
+_TOOLS_CACHE: Dict[str, Tuple[float, List[BaseTool]]] = {}
+
 
 def create_pydantic_schema_from_mcp(tool_name: str, input_schema: Dict[str, Any]) -> Type[BaseModel]:
     """Create a Pydantic schema from MCP tool input schema"""
@@ -98,8 +105,6 @@ class DynamicMalloyTool(BaseTool):
         **kwargs
     ) -> str:
         """Execute the Malloy tool operation dynamically"""
-        import json  # Local import to ensure availability in async context
-        
         try:
             self._logger.debug("=" * 50)
             self._logger.debug(f"🛠️ TOOL EXECUTION: {self.name}")
@@ -111,46 +116,47 @@ class DynamicMalloyTool(BaseTool):
             result = await self._mcp_client.call_tool(self.name, kwargs)
             
             self._logger.debug(f"✅ Tool result: {result}")
-            return json.dumps(result)
+            return orjson.dumps(result).decode()
                 
         except Exception as e:
             self._logger.error(f"❌ Error executing {self.name}: {e}")
-            return json.dumps({
+            return orjson.dumps({
                 "operation": self.name.replace("malloy_", ""),
                 "success": False,
                 "error": str(e),
                 "tool_name": self.name,
                 "arguments": kwargs
-            })
+            }, default=str).decode()
 
 
 class MalloyToolsFactory:
     """Factory for creating Malloy tools from MCP server capabilities"""
     
-    def __init__(self, mcp_url: str):
+    def __init__(self, mcp_url: str, mcp_client: Optional[SimpleMCPClient] = None):
         self.mcp_url = mcp_url
-        self.mcp_client = SimpleMCPClient(mcp_url)
+        # Reuse the caller's client, and its connection pool, when given one
+        self.mcp_client = mcp_client or SimpleMCPClient(mcp_url)
         self.logger = logging.getLogger(__name__)
 
     async def create_tools(self) -> List[BaseTool]:
         """Create all available tools dynamically from MCP server definitions"""
+        cached = _TOOLS_CACHE.get(self.mcp_url)
+        if cached is not None and time.monotonic() - cached[0] < TOOLS_CACHE_TTL:
+            self.logger.debug("Reusing cached tools for %s", self.mcp_url)
+            return list(cached[1])
+        
         try:
             self.logger.info("Creating Malloy tools using SimpleMCPClient")
             
-            # Test connection first
-            connected = await self.mcp_client.test_connection()
-            if not connected:
-                self.logger.error("Failed to connect to MCP server")
-                return [QuickChartTool()]
-            
-            # Get tool definitions from MCP server
+            # Get tool definitions from MCP server; an unreachable server raises here
             tool_definitions = await self.mcp_client.get_tool_definitions()
             self.logger.debug(f"Retrieved {len(tool_definitions)} tool definitions from MCP server")
             
             malloy_tools = []
             
-            # Create tools dynamically from MCP definitions
-            for tool_def in tool_definitions:
+            # Create tools dynamically from MCP definitions, in a stable order so the
+            # tool definitions sent to the LLM form a cacheable prompt prefix
+            for tool_def in sorted(tool_definitions, key=lambda d: d["name"]):
                 tool_name = tool_def["name"]
                 description = tool_def["description"]
                 input_schema = tool_def["inputSchema"]
@@ -183,7 +189,9 @@ class MalloyToolsFactory:
             all_tools = malloy_tools + [chart_tool]
             
             self.logger.info(f"Created {len(all_tools)} tools: {[tool.name for tool in all_tools]}")
-            return all_tools
+            # Only a successful fetch is cached; the fallbacks below retry next time
+            _TOOLS_CACHE[self.mcp_url] = (time.monotonic(), all_tools)
+            return list(all_tools)
             
         except Exception as e:
             self.logger.error(f"Error creating Malloy tools: {e}")
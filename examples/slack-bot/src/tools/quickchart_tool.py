@@ -2,7 +2,9 @@
 QuickChart.io Chart Generation Tool
 Creates charts using Chart.js configurations via QuickChart.io web service
 """
-import json
+import asyncio
+import threading
+import orjson
 import requests
 from typing import Dict, Any
 from langchain.tools import BaseTool
@@ -13,6 +15,19 @@ try:
 except ImportError:
     QuickChart = None
 
+QUICKCHART_CREATE_URL = "https://quickchart.io/chart/create"
+
+# requests.Session isn't thread-safe and charts are generated in worker threads,
+# so each thread keeps its own session and its keep-alive connection to QuickChart.io
+_thread_local = threading.local()
+
+
+def _get_http_session() -> requests.Session:
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+    return session
+
 
 class QuickChartInput(BaseModel):
     """Input for QuickChart tool"""
@@ -98,14 +113,15 @@ class QuickChartTool(BaseTool):
                 "height": height
             }
             
-            response = requests.post(
-                "https://quickchart.io/chart/create",
-                json=payload,
+            response = _get_http_session().post(
+                QUICKCHART_CREATE_URL,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
                 timeout=30
             )
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             if "url" in result:
                 return result["url"]
             else:
@@ -120,12 +136,12 @@ class QuickChartTool(BaseTool):
         """Generate chart using QuickChart.io and return URL"""
         
         if QuickChart is None:
-            return json.dumps({
+            return orjson.dumps({
                 "text": "Chart generation failed: quickchart.io library not installed",
                 "status": "error",
                 "error": "missing_dependency",
                 "suggestion": "Install the quickchart.io library: pip install quickchart.io"
-            })
+            }).decode()
         
         try:
             # Validate basic chart config structure
@@ -172,7 +188,7 @@ class QuickChartTool(BaseTool):
                 url_type = "regular"
                 url_note = "Regular URL - stable for long-term use"
             
-            return json.dumps({
+            return orjson.dumps({
                 "text": f"Chart created successfully! ({url_type} URL)",
                 "chart_url": chart_url,
                 "status": "success",
@@ -181,27 +197,31 @@ class QuickChartTool(BaseTool):
                 "chart_type": config.get("type", "unknown"),
                 "url_type": url_type,
                 "url_note": url_note
-            })
+            }).decode()
             
         except ValueError as e:
-            return json.dumps({
+            return orjson.dumps({
                 "text": f"Chart configuration error: {str(e)}",
                 "status": "error",
                 "error": "invalid_config",
                 "suggestion": "Check your Chart.js configuration. Ensure it has 'type' and 'data' fields."
-            })
+            }).decode()
         except Exception as e:
             error_msg = str(e)
-            return json.dumps({
+            return orjson.dumps({
                 "text": f"Chart generation failed: {error_msg}",
                 "status": "error",
                 "error": "quickchart_api_error",
                 "suggestion": "Check your internet connection and try again. If the error persists, try a simpler chart configuration."
-            })
+            }).decode()
 
     async def _arun(self, chart_config: dict, width: int = 500, height: int = 300, title: str = "", use_short_url: bool = True) -> str:
-        """Async version of chart generation"""
-        return self._run(chart_config, width, height, title, use_short_url)
+        """Async version of chart generation
+        
+        The HTTP call blocks, so it runs in a worker thread; otherwise it would
+        stall the agent's event loop and any tool calls running alongside it.
+        """
+        return await asyncio.to_thread(self._run, chart_config, width, height, title, use_short_url)
 
 
 def create_quickchart_tool() -> QuickChartTool:
@@ -0,0 +1,57 @@
+"""
+Test chart result extraction from agent responses
+"""
+
+import pytest
+from src.agents.malloy_langchain_agent import MalloyLangChainAgent
+
+
+class TestChartExtraction:
+    """Test detection of chart results in agent responses"""
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.agent = MalloyLangChainAgent(mcp_url="http://localhost:4040/mcp")
+
+    def test_json_fenced_response(self):
+        """Test a chart result wrapped in a ```json fence"""
+        response = '```json\n{"chart_url": "https://quickchart.io/chart/render/abc", "status": "success"}\n```'
+
+        result = self.agent._extract_chart_result(response)
+
+        assert result == {"chart_url": "https://quickchart.io/chart/render/abc", "status": "success"}
+
+    def test_bare_fenced_response(self):
+        """Test a chart result wrapped in a plain ``` fence"""
+        response = '```\n{"chart_url": "https://quickchart.io/chart/render/abc", "status": "success"}\n```'
+
+        result = self.agent._extract_chart_result(response)
+
+        assert result["chart_url"] == "https://quickchart.io/chart/render/abc"
+
+    def test_unfenced_json_response(self):
+        """Test a raw JSON chart result"""
+        response = '{"chart_url": "https://quickchart.io/chart/render/abc", "status": "success", "title": "Sales"}'
+
+        result = self.agent._extract_chart_result(response)
+
+        assert result["title"] == "Sales"
+
+    def test_chart_url_in_text(self):
+        """Test a chart URL embedded in prose falls back to the string match"""
+        response = 'Here is your chart - status: done, "chart_url": "https://quickchart.io/chart/render/abc"'
+
+        result = self.agent._extract_chart_result(response)
+
+        assert result == {"chart_url": "https://quickchart.io/chart/render/abc", "status": "success"}
+
+    def test_plain_text_response(self):
+        """Test a response without a chart"""
+        assert self.agent._extract_chart_result("The top brand is Acme.") is None
+
+    def test_content_block_response(self):
+        """Test a response given as a list of content blocks"""
+        response = [{"type": "text", "text": '{"chart_url": "https://quickchart.io/chart/render/abc", "status": "success"}'}]
+
+        assert self.agent._extract_chart_result(response)["chart_url"] == "https://quickchart.io/chart/render/abc"
+        assert self.agent._extract_tools_used(response) == ["generate_chart"]
@@ -0,0 +1,101 @@
+"""
+Test turning the agent's final message into a response, and session compaction
+"""
+
+import asyncio
+import logging
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+from src.agents.malloy_langchain_agent import MAX_CHECKPOINT_MESSAGES, MalloyLangChainAgent
+
+
+class FakeExecutor:
+    """Returns a fixed final message instead of running the graph"""
+
+    def __init__(self, final_message):
+        self.final_message = final_message
+
+    async def ainvoke(self, inputs, config):
+        return {"messages": [HumanMessage(content="top brands"), self.final_message]}
+
+
+class TestProcessQuestion:
+    """Test process_question result handling"""
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.agent = MalloyLangChainAgent(mcp_url="http://localhost:4040/mcp")
+        self.agent.tools = []
+
+    def test_string_content(self):
+        """Test a plain text final message"""
+        self.agent.agent_executor = FakeExecutor(AIMessage(content="Nike sells the most."))
+
+        success, response, metadata = asyncio.run(self.agent.process_question("top brands"))
+
+        assert success
+        assert response == "Nike sells the most."
+        assert metadata["message_count"] == 2
+
+    def test_content_blocks(self):
+        """Test a final message made of content blocks, as Anthropic returns with tools bound"""
+        final_message = AIMessage(content=[
+            {"type": "text", "text": "Nike sells "},
+            {"type": "tool_use", "id": "t1", "name": "malloy_executeQuery", "input": {}},
+            {"type": "text", "text": "the most."},
+        ])
+        self.agent.agent_executor = FakeExecutor(final_message)
+
+        success, response, metadata = asyncio.run(self.agent.process_question("top brands"))
+
+        assert success
+        assert response == "Nike sells the most."
+        assert metadata["tools_used"] == []
+
+    def test_content_blocks_with_debug_logging(self):
+        """Test the debug dump of a many-block message doesn't fail the answer"""
+        self.agent.logger.setLevel(logging.DEBUG)
+        self.agent.agent_executor = FakeExecutor(AIMessage(content=[{"type": "text", "text": "x"}] * 201))
+
+        try:
+            success, response, _ = asyncio.run(self.agent.process_question("top brands"))
+        finally:
+            self.agent.logger.setLevel(logging.NOTSET)
+
+        assert success
+        assert response == "x" * 201
+
+
+class TestSessionCompaction:
+    """Test the checkpointed history of a long session stays bounded"""
+
+    def setup_method(self):
+        """Setup an agent with a real checkpointer and a graph that never calls a model"""
+        self.agent = MalloyLangChainAgent(mcp_url="http://localhost:4040/mcp")
+        self.agent.memory = MemorySaver()
+        self.agent.agent_executor = create_react_agent(
+            model=FakeListChatModel(responses=["unused"]), tools=[], checkpointer=self.agent.memory
+        )
+
+    def test_long_session_is_cut_back_to_recent_turns(self):
+        """Test old turns and their checkpoints are dropped past the limit"""
+        async def talk():
+            for i in range(MAX_CHECKPOINT_MESSAGES):
+                await self.agent.remember_exchange(f"question {i}", f"answer {i}", "t1")
+
+        asyncio.run(talk())
+
+        messages = self.agent.get_session_messages("t1")
+        assert len(messages) <= MAX_CHECKPOINT_MESSAGES
+        assert isinstance(messages[0], HumanMessage)
+        assert messages[-1].content == f"answer {MAX_CHECKPOINT_MESSAGES - 1}"
+        assert len(self.agent.memory.storage["t1"][""]) < MAX_CHECKPOINT_MESSAGES
+
+    def test_short_session_is_untouched(self):
+        """Test sessions under the limit keep every message"""
+        asyncio.run(self.agent.remember_exchange("question", "answer", "t1"))
+
+        assert [m.content for m in self.agent.get_session_messages("t1")] == ["question", "answer"]
@@ -0,0 +1,97 @@
+"""
+Test reuse of answers to repeated opening questions
+"""
+
+import pytest
+from src.agents import langchain_compatibility_adapter as adapter_module
+from src.agents.langchain_compatibility_adapter import LangChainCompatibilityAdapter, _normalize_question
+from src.agents.malloy_langchain_agent import MalloyLangChainAgent
+
+
+class FakeAgent:
+    """Counts agent runs and tracks which sessions have messages"""
+
+    session_id = "default"
+    tools = []
+
+    def __init__(self):
+        self.runs = 0
+        self.sessions = set()
+        self.remembered = []
+
+    def has_conversation(self, session_id):
+        return session_id in self.sessions
+
+    async def remember_exchange(self, question, response, session_id):
+        self.sessions.add(session_id)
+        self.remembered.append((question, response, session_id))
+
+    async def process_question(self, question, session_id=None, on_partial=None):
+        self.runs += 1
+        self.sessions.add(session_id)
+        return True, f"answer {self.runs}", {}
+
+    def get_conversation_history(self):
+        return []
+
+    process_questions_batch = MalloyLangChainAgent.process_questions_batch
+
+
+class TestResponseCache:
+    """Test the adapter's response cache"""
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.fake_agent = FakeAgent()
+
+        async def create_fake_agent(**kwargs):
+            return self.fake_agent
+
+        self.monkeypatch = pytest.MonkeyPatch()
+        self.monkeypatch.setattr(adapter_module, "create_malloy_agent", create_fake_agent)
+        self.adapter = LangChainCompatibilityAdapter()
+
+    def teardown_method(self):
+        """Restore the agent factory"""
+        self.monkeypatch.undo()
+
+    def test_normalize_question(self):
+        """Test case, spacing and trailing punctuation are ignored"""
+        assert _normalize_question("  What are the  Top Brands?? ") == "what are the top brands"
+
+    def test_repeated_opening_question_is_cached(self):
+        """Test a new conversation reuses an earlier answer and records it"""
+        self.adapter.process_user_question("Top brands?", session_id="t1")
+
+        success, response, _ = self.adapter.process_user_question("top brands", session_id="t2")
+
+        assert success
+        assert response == "answer 1"
+        assert self.fake_agent.runs == 1
+        assert self.fake_agent.remembered == [("top brands", "answer 1", "t2")]
+
+    def test_follow_up_is_not_cached(self):
+        """Test a question in an ongoing conversation always runs the agent"""
+        self.adapter.process_user_question("top brands", session_id="t1")
+
+        _, response, _ = self.adapter.process_user_question("top brands", session_id="t1")
+
+        assert response == "answer 2"
+
+    def test_expired_answer_is_not_reused(self):
+        """Test answers older than the TTL are dropped"""
+        self.adapter.process_user_question("top brands", session_id="t1")
+        self.monkeypatch.setattr(adapter_module, "RESPONSE_CACHE_TTL", -1)
+
+        _, response, _ = self.adapter.process_user_question("top brands", session_id="t2")
+
+        assert response == "answer 2"
+
+    def test_batch_questions_get_own_sessions_and_use_cache(self):
+        """Test batch questions without a session don't share one and still hit the cache"""
+        results = self.adapter.process_questions_batch([("top brands", None), ("Top brands?", None)], max_concurrency=1)
+
+        assert [response for _, response, _ in results] == ["answer 1", "answer 1"]
+        assert self.fake_agent.runs == 1
+        assert len(self.fake_agent.sessions) == 2
+        assert "default" not in self.fake_agent.sessions